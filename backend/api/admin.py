@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Workflow
+
+
+@admin.register(Workflow)
+class WorkflowAdmin(admin.ModelAdmin):
+    list_display = ('slug', 'url', 'enabled', 'auth_required', 'cache_ttl', 'updated_at')
+    list_filter = ('enabled', 'auth_required')
+    search_fields = ('slug', 'url')
@@ -0,0 +1,342 @@
+"""
+Admission control for workflow triggers
+Caps the triggers calling n8n at once, queues the rest by priority and sheds those that would wait too long
+"""
+import asyncio
+import bisect
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+DEFAULT_ADMISSION = {
+    "MAX_IN_FLIGHT": 0,             # Triggers calling n8n at once per process; 0 for no limit
+    "SLUG_MAX_IN_FLIGHT": 0,        # The same per slug; 0 for no limit
+    "MAX_QUEUE": 100,               # Triggers waiting for a slot before new ones are shed
+    "MAX_WAIT_SECONDS": 5,          # Longest a trigger waits for a slot
+}
+
+# Weight of the latest call in the average time a slot is held
+_HOLD_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """Raised instead of calling n8n when a trigger can't get a slot in time"""
+
+    def __init__(self, slug, reason, retry_after):
+        super().__init__(f"Too many triggers in flight for workflow '{slug}' ({reason})")
+        self.slug = slug
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A trigger queued for a slot; woken through an Event, or a Future for async callers"""
+
+    __slots__ = ("priority", "seq", "slug", "granted", "event", "loop", "future")
+
+    def __init__(self, priority, seq, slug, loop=None):
+        self.priority = priority
+        self.seq = seq
+        self.slug = slug
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Bounds triggers in flight per process and per slug
+
+    A trigger takes a slot when both its slug and the process have room;
+    otherwise it waits, INTERACTIVE triggers ahead of BULK ones and in arrival
+    order within a priority. A freed slot goes to the first waiter whose slug
+    has room, so a busy slug doesn't hold up the others.
+
+    Waiting is bounded by MAX_WAIT_SECONDS. From the average time a slot is
+    held and the waiters ahead, a trigger that would not get a slot within
+    that time is shed at once instead of failing after waiting it out, as is
+    one arriving to a queue of MAX_QUEUE.
+
+    Args:
+        slug_limits: Slot counts per slug overriding SLUG_MAX_IN_FLIGHT (0 for no limit)
+    """
+
+    def __init__(self, slug_limits=None, **options):
+        config = {**DEFAULT_ADMISSION, **options}
+        self.max_in_flight = config["MAX_IN_FLIGHT"]
+        self.slug_max_in_flight = config["SLUG_MAX_IN_FLIGHT"]
+        self.slug_limits = dict(slug_limits or {})
+        self.max_queue = config["MAX_QUEUE"]
+        self.max_wait = config["MAX_WAIT_SECONDS"]
+
+        self.in_flight = 0
+        self._slug_in_flight = {}
+        self._hold = {}
+        self._waiters = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, slug, priority=INTERACTIVE):
+        """
+        Take a slot for a trigger of slug, waiting for one if needed
+
+        Returns:
+            float: Seconds spent waiting
+
+        Raises:
+            Overloaded: If the trigger was shed
+        """
+        started = time.monotonic()
+        waiter = self._enter(slug, priority)
+        if waiter is not None and not waiter.event.wait(self.max_wait) and not self._abandon(waiter):
+            raise self._shed(slug, "timeout")
+        return self._admitted(slug, priority, started)
+
+    async def aacquire(self, slug, priority=INTERACTIVE):
+        """Async counterpart of acquire(); waits without blocking the event loop"""
+        started = time.monotonic()
+        waiter = self._enter(slug, priority, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    raise self._shed(slug, "timeout") from None
+            except asyncio.CancelledError:
+                # A slot granted as the caller went away is passed on
+                if self._abandon(waiter):
+                    self.release(slug)
+                raise
+        return self._admitted(slug, priority, started)
+
+    def release(self, slug, held=None):
+        """
+        Give back a slot taken with acquire() and hand it to the next waiter
+
+        Args:
+            slug: Workflow identifier the slot was taken for
+            held: Seconds the slot was held, feeding the wait estimate
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self._slug_in_flight[slug] -= 1
+            if held is not None:
+                for key in (None, slug):
+                    previous = self._hold.get(key)
+                    self._hold[key] = held if previous is None else previous + _HOLD_ALPHA * (held - previous)
+            self._grant()
+
+    def stats(self):
+        """Return slots taken and triggers waiting per priority"""
+        with self._lock:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for waiter in self._waiters:
+                waiting[PRIORITY_NAMES[waiter.priority]] += 1
+            return {
+                "in_flight": self.in_flight,
+                "slugs": {slug: count for slug, count in self._slug_in_flight.items() if count},
+                "waiting": waiting,
+            }
+
+    def _enter(self, slug, priority, loop=None):
+        # Returns None when a slot was taken at once, else the queued waiter
+        with self._lock:
+            # Slots are handed to waiters as soon as they free up, so room
+            # left now is room no waiter can use
+            if self._has_room(slug):
+                self._take(slug)
+                return None
+            if len(self._waiters) >= self.max_queue:
+                reason = "queue_full"
+            elif self._expected_wait(slug, priority) > self.max_wait:
+                reason = "deadline"
+            else:
+                waiter = _Waiter(priority, next(self._seq), slug, loop)
+                bisect.insort(self._waiters, waiter)
+                return waiter
+        raise self._shed(slug, reason)
+
+    def _abandon(self, waiter):
+        # Whether the waiter got a slot after all; otherwise it leaves the queue
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _has_room(self, slug):
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return False
+        limit = self.slug_limits.get(slug, self.slug_max_in_flight)
+        return not limit or self._slug_in_flight.get(slug, 0) < limit
+
+    def _take(self, slug):
+        self.in_flight += 1
+        self._slug_in_flight[slug] = self._slug_in_flight.get(slug, 0) + 1
+
+    def _grant(self):
+        for waiter in list(self._waiters):
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                break
+            if self._has_room(waiter.slug):
+                self._waiters.remove(waiter)
+                self._take(waiter.slug)
+                waiter.grant()
+
+    def _expected_wait(self, slug, priority):
+        # Slots of a limit free up every (average hold / limit) seconds; the
+        # trigger needs one after each waiter served before it. Later
+        # interactive arrivals can still overtake bulk ones.
+        estimate = 0.0
+        limit = self.slug_limits.get(slug, self.slug_max_in_flight)
+        if limit and self._slug_in_flight.get(slug, 0) >= limit and slug in self._hold:
+            ahead = sum(1 for waiter in self._waiters if waiter.slug == slug and waiter.priority <= priority)
+            estimate = (ahead + 1) * self._hold[slug] / limit
+        if self.max_in_flight and self.in_flight >= self.max_in_flight and None in self._hold:
+            ahead = sum(1 for waiter in self._waiters if waiter.priority <= priority)
+            estimate = max(estimate, (ahead + 1) * self._hold[None] / self.max_in_flight)
+        return estimate
+
+    def _admitted(self, slug, priority, started):
+        waited = time.monotonic() - started
+        labels = (("slug", slug), ("priority", PRIORITY_NAMES[priority]))
+        metrics.registry.observe("n8n_proxy_admission_wait_seconds", labels, waited)
+        return waited
+
+    def _shed(self, slug, reason):
+        with self._lock:
+            retry_after = self._hold.get(slug, self._hold.get(None, 1.0))
+        logger.warning("Shedding trigger of workflow %s (%s)", slug, reason, extra={"slug": slug})
+        metrics.registry.inc("n8n_proxy_shed_total", (("slug", slug), ("reason", reason)))
+        return Overloaded(slug, reason, max(retry_after, 1.0))
+
+
+def priority_for(user, bulk=False):
+    """Priority of a trigger: INTERACTIVE for signed-in callers, BULK for anonymous ones and batches"""
+    return BULK if bulk or not user.is_authenticated else INTERACTIVE
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    """
+    Return the process-wide admission controller
+
+    Options come from settings.N8N_ADMISSION, with per-slug slot counts in
+    settings.N8N_ADMISSION_LIMITS.
+
+    Returns:
+        AdmissionController: The controller, or None when nothing is limited
+    """
+    global _controller
+    config = (getattr(settings, 'N8N_ADMISSION', {}), getattr(settings, 'N8N_ADMISSION_LIMITS', {}))
+    cached = _controller
+    if cached is not None and cached[0] == config:
+        return cached[1]
+
+    with _controller_lock:
+        if _controller is None or _controller[0] != config:
+            options, slug_limits = config
+            controller = AdmissionController(slug_limits, **options)
+            limited = controller.max_in_flight or controller.slug_max_in_flight or any(slug_limits.values())
+            _controller = (config, controller if limited else None)
+        return _controller[1]
+
+
+def acquire(slug, priority=INTERACTIVE):
+    """
+    Take an admission slot for slug that outlives a with block (e.g. a streamed body)
+
+    Returns:
+        callable: Gives the slot back; later calls do nothing
+
+    Raises:
+        Overloaded: If the trigger was shed
+    """
+    controller = get_controller()
+    if controller is None:
+        return lambda: None
+    controller.acquire(slug, priority)
+    started = time.monotonic()
+    once = threading.Lock()
+
+    def release():
+        if once.acquire(blocking=False):
+            controller.release(slug, time.monotonic() - started)
+    return release
+
+
+@contextmanager
+def slot(slug, priority=INTERACTIVE):
+    """
+    Hold an admission slot for slug around the block
+
+    Raises:
+        Overloaded: If the trigger was shed before the block ran
+    """
+    release = acquire(slug, priority)
+    try:
+        yield
+    finally:
+        release()
+
+
+@asynccontextmanager
+async def aslot(slug, priority=INTERACTIVE):
+    """Async counterpart of slot()"""
+    controller = get_controller()
+    if controller is None:
+        yield
+        return
+    await controller.aacquire(slug, priority)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        controller.release(slug, time.monotonic() - started)
+
+
+def admission_stats():
+    """Return the controller's stats, or None when admission control is off"""
+    controller = _controller[1] if _controller is not None else None
+    return controller.stats() if controller is not None else None
+
+
+def reset_controller():
+    """Forget the controller (used in tests)"""
+    global _controller
+    with _controller_lock:
+        _controller = None
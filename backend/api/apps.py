@@ -3,3 +3,42 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import (
+            admission, circuit_breaker, load_balancer, metrics, n8n_client, registry, response_cache, singleflight,
+            validation,
+        )
+
+        # Compiled now so a broken schema stops startup rather than failing requests
+        validation.compile_all()
+
+        def collect_components():
+            pool = n8n_client.pool_stats()
+            yield metrics.COUNTER, "n8n_pool_session_hits_total", (), pool["session_hits"]
+            for host, stats in pool["hosts"].items():
+                labels = (("host", host),)
+                yield metrics.COUNTER, "n8n_pool_new_connections_total", labels, stats["new_connections"]
+                yield metrics.COUNTER, "n8n_pool_connection_reuses_total", labels, stats["reuses"]
+            for slug, stats in response_cache.cache_stats().items():
+                yield metrics.COUNTER, "n8n_cache_hits_total", (("slug", slug),), stats["hits"]
+                yield metrics.COUNTER, "n8n_cache_misses_total", (("slug", slug),), stats["misses"]
+            for slug, stats in circuit_breaker.breaker_stats().items():
+                yield metrics.GAUGE, "n8n_circuit_open", (("slug", slug),), int(stats["state"] != circuit_breaker.CLOSED)
+                yield metrics.COUNTER, "n8n_circuit_rejected_total", (("slug", slug),), stats["rejected"]
+            for slug, endpoints in load_balancer.upstream_stats().items():
+                for endpoint in endpoints:
+                    labels = (("slug", slug), ("endpoint", endpoint["host"]))
+                    yield metrics.GAUGE, "n8n_upstream_in_flight", labels, endpoint["in_flight"]
+                    yield metrics.GAUGE, "n8n_upstream_ejected", labels, int(endpoint["ejected"])
+            admitted = admission.admission_stats()
+            if admitted is not None:
+                for priority, waiting in admitted["waiting"].items():
+                    yield metrics.GAUGE, "n8n_proxy_admission_waiting", (("priority", priority),), waiting
+            flights = singleflight.workflow_calls.stats()
+            yield metrics.COUNTER, "n8n_single_flight_coalesced_total", (), flights["coalesced"]
+            if registry.workflows.version is not None:
+                yield metrics.GAUGE, "n8n_registry_version", (), registry.workflows.version
+
+        metrics.registry.register_collector(collect_components)
+        metrics.start_flusher()
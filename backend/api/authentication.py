@@ -0,0 +1,208 @@
+"""
+Stateless bearer-token authentication
+HMAC-signed tokens checked without a database query, and a short-lived in-process cache of user records
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django.db.models.signals import post_delete, post_save
+from django.utils.crypto import constant_time_compare
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, CSRFCheck, get_authorization_header
+
+from .response_cache import LRUCache
+
+TOKEN_SALT = "api.authentication.token"
+KEYWORD = "Bearer"
+
+
+def _password_fingerprint(user):
+    # Changes with the password, so a password change revokes every token of the user
+    return user.get_session_auth_hash()[:16]
+
+
+def issue_token(user):
+    """
+    Sign a bearer token for a user
+
+    Returns:
+        str: Token valid for settings.AUTH_TOKEN_TTL seconds
+    """
+    return signing.dumps({"u": user.pk, "h": _password_fingerprint(user)}, salt=TOKEN_SALT, compress=False)
+
+
+def verify_token(token):
+    """
+    Check a token's signature and expiry and return its user
+
+    Raises:
+        AuthenticationFailed: If the token is malformed, expired, revoked or its user is inactive
+    """
+    claims = _load_claims(token)
+    return _user_for_claims(claims, cached_user(claims["u"]))
+
+
+def _load_claims(token):
+    try:
+        claims = signing.loads(token, salt=TOKEN_SALT, max_age=getattr(settings, 'AUTH_TOKEN_TTL', 3600))
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed("Token has expired")
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed("Invalid token")
+    if not isinstance(claims, dict) or "u" not in claims:
+        raise exceptions.AuthenticationFailed("Invalid token")
+    return claims
+
+
+def _user_for_claims(claims, user):
+    if user is None or not constant_time_compare(claims.get("h", ""), _password_fingerprint(user)):
+        raise exceptions.AuthenticationFailed("Invalid token")
+    return user
+
+
+def _bearer_token(authorization):
+    parts = authorization.split()
+    if not parts or parts[0].lower() != KEYWORD.lower().encode():
+        return None
+    if len(parts) != 2:
+        raise exceptions.AuthenticationFailed("Invalid Authorization header")
+    try:
+        return parts[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed("Invalid Authorization header")
+
+
+class BearerTokenAuthentication(BaseAuthentication):
+    """
+    DRF authentication for `Authorization: Bearer <token>` headers
+
+    Requests without a bearer token fall through to the next authentication
+    class; an invalid or expired token is rejected with 401.
+    """
+
+    def authenticate(self, request):
+        token = _bearer_token(get_authorization_header(request))
+        if token is None:
+            return None
+        return verify_token(token), token
+
+    def authenticate_header(self, request):
+        return f'{KEYWORD} realm="api"'
+
+
+async def aauthenticate(request):
+    """
+    Resolve the user of a plain Django request from an async view
+
+    Uses the bearer token when there is one, otherwise the session. Like
+    DRF's SessionAuthentication, a session user must pass the CSRF check, as
+    the async views are csrf_exempt for the sake of bearer-token callers.
+
+    Raises:
+        AuthenticationFailed: If a bearer token is present but invalid
+        PermissionDenied: If a session request fails the CSRF check
+    """
+    token = _bearer_token(get_authorization_header(request))
+    if token is None:
+        user = await request.auser() if hasattr(request, 'auser') else AnonymousUser()
+        if user.is_authenticated:
+            _enforce_csrf(request)
+        return user
+    claims = _load_claims(token)
+    user = _users().get(claims["u"])
+    if user is None:
+        user = await sync_to_async(cached_user)(claims["u"])
+    elif not user.is_active:
+        user = None
+    return _user_for_claims(claims, user)
+
+
+def _enforce_csrf(request):
+    # Same check as SessionAuthentication.enforce_csrf, for a plain Django request
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    reason = check.process_view(request, None, (), {})
+    if reason:
+        raise exceptions.PermissionDenied(f"CSRF Failed: {reason}")
+
+
+# User record cache -----------------------------------------------------------
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _users():
+    global _cache
+    config = (getattr(settings, 'AUTH_USER_CACHE_TTL', 30), getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 1024))
+    cached = _cache
+    if cached is not None and cached[0] == config:
+        return cached[1]
+    with _cache_lock:
+        if _cache is None or _cache[0] != config:
+            _cache = (config, LRUCache(config[1]))
+        return _cache[1]
+
+
+def cached_user(user_id):
+    """
+    Return an active user by primary key, from the in-process cache when possible
+
+    Entries live for settings.AUTH_USER_CACHE_TTL seconds, or until the user
+    is saved or deleted in this process. Treat returned users as read-only:
+    the same instance is shared between requests.
+
+    Returns:
+        User: The user, or None if it doesn't exist or is inactive
+    """
+    users = _users()
+    user = users.get(user_id)
+    if user is None:
+        user_model = get_user_model()
+        try:
+            user = user_model._default_manager.get(pk=user_id)
+        except (user_model.DoesNotExist, ValueError, TypeError):
+            return None
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+        if ttl:
+            users.set(user_id, user, ttl)
+    return user if getattr(user, 'is_active', True) else None
+
+
+def invalidate_user(user_id):
+    """Drop a user from this process's cache"""
+    if _cache is not None:
+        _cache[1].delete(user_id)
+
+
+def reset_user_cache():
+    """Forget every cached user (used in tests)"""
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+post_save.connect(_user_changed, sender=settings.AUTH_USER_MODEL)
+post_delete.connect(_user_changed, sender=settings.AUTH_USER_MODEL)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose session lookups go through the user cache
+
+    Logging in still checks the password against the database; resolving the
+    user of an existing session no longer queries the user table.
+    """
+
+    def get_user(self, user_id):
+        return cached_user(user_id)
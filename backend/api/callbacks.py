@@ -0,0 +1,120 @@
+"""
+Callback mode for n8n workflow triggers
+Signed callback URLs n8n posts results to, and waiting for a job's result by long-poll or server-sent events
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from asgiref.sync import sync_to_async
+
+from . import jobs
+
+CALLBACK_SALT = "api.callbacks.callback"
+
+
+def _signer():
+    # Keyed with the secret n8n already shares with the proxy, not the Django SECRET_KEY
+    return signing.TimestampSigner(key=settings.N8N_SECRET_KEY, salt=CALLBACK_SALT)
+
+
+def callback_token(job_id):
+    """Sign a job id for use in its callback URL"""
+    return _signer().sign(job_id)
+
+
+def verify_callback_token(token):
+    """
+    Return the job id of a callback token
+
+    Raises:
+        signing.BadSignature: If the token was tampered with, or signing.SignatureExpired
+            once it is older than settings.N8N_CALLBACK_TIMEOUT
+    """
+    return _signer().unsign(token, max_age=getattr(settings, 'N8N_CALLBACK_TIMEOUT', 3600))
+
+
+def callback_url(request, job_id):
+    """
+    Absolute URL n8n posts a callback-mode job's result to
+
+    Built on settings.N8N_CALLBACK_BASE_URL when set, for n8n instances that
+    reach the API on a different address than the browser does.
+    """
+    path = reverse('workflow-callback', args=[callback_token(job_id)])
+    base_url = getattr(settings, 'N8N_CALLBACK_BASE_URL', None)
+    if base_url:
+        return base_url.rstrip('/') + path
+    return request.build_absolute_uri(path)
+
+
+def expire_overdue(store, job):
+    """
+    Fail a job that has waited longer than settings.N8N_CALLBACK_TIMEOUT for its callback
+
+    Returns:
+        dict: The job as it now stands
+    """
+    if job is None or job["status"] != jobs.WAITING:
+        return job
+    if time.time() - job["updated_at"] < getattr(settings, 'N8N_CALLBACK_TIMEOUT', 3600):
+        return job
+    if store.complete(job["id"], jobs.FAILED, 504, {"error": "Workflow callback timed out"}):
+        jobs.notify(job["id"])
+    return store.get(job["id"])
+
+
+def wait_for_job(store, job_id, timeout):
+    """
+    Block until a job finishes or `timeout` seconds pass
+
+    Jobs finished by this process wake the caller at once; those finished by
+    other worker processes are noticed within settings.N8N_JOB_POLL_INTERVAL.
+
+    Returns:
+        dict: The job, or None if it doesn't exist
+    """
+    wake = threading.Event()
+    jobs.add_waiter(job_id, wake.set)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = expire_overdue(store, store.get(job_id))
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in jobs.FINISHED or remaining <= 0:
+                return job
+            wake.wait(min(remaining, getattr(settings, 'N8N_JOB_POLL_INTERVAL', 1.0)))
+            wake.clear()
+    finally:
+        jobs.remove_waiter(job_id, wake.set)
+
+
+async def await_job(store, job_id, timeout):
+    """Async counterpart of wait_for_job() that doesn't hold a thread while waiting"""
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+
+    def wake():
+        loop.call_soon_threadsafe(event.set)
+
+    jobs.add_waiter(job_id, wake)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await sync_to_async(lambda: expire_overdue(store, store.get(job_id)))()
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in jobs.FINISHED or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(
+                    event.wait(), min(remaining, getattr(settings, 'N8N_JOB_POLL_INTERVAL', 1.0))
+                )
+            except asyncio.TimeoutError:
+                pass
+            event.clear()
+    finally:
+        jobs.remove_waiter(job_id, wake)
@@ -0,0 +1,220 @@
+"""
+Per-slug circuit breakers and timeouts for n8n upstreams
+Fails fast while a workflow is erroring or slow, then probes it before letting traffic back in
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import registry
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_BREAKER = {
+    "WINDOW_SECONDS": 30,         # Sliding window outcomes are counted over
+    "MIN_CALLS": 10,              # Calls needed in the window before the breaker can trip
+    "FAILURE_RATE": 0.5,          # Share of failed calls that opens the breaker
+    "SLOW_CALL_SECONDS": 5,       # Calls slower than this count as slow
+    "SLOW_CALL_RATE": 0.8,        # Share of slow calls that opens the breaker
+    "OPEN_SECONDS": 30,           # How long to fail fast before probing again
+    "HALF_OPEN_PROBES": 1,        # Concurrent trial calls allowed while half-open
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling n8n while a workflow's breaker is open"""
+
+    def __init__(self, slug, retry_after):
+        super().__init__(f"Circuit open for workflow '{slug}'")
+        self.slug = slug
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Tracks error and latency rates of one upstream over a sliding window
+
+    closed: calls pass and outcomes are recorded; too many failures or slow
+    calls open the breaker. open: calls are refused until OPEN_SECONDS have
+    passed. half_open: a limited number of probes pass; a good probe closes
+    the breaker, a bad one opens it again.
+    """
+
+    def __init__(self, slug, host=None, **options):
+        self.slug = slug
+        self.host = host
+        config = {**DEFAULT_BREAKER, **options}
+        self.window_seconds = config["WINDOW_SECONDS"]
+        self.min_calls = config["MIN_CALLS"]
+        self.failure_rate = config["FAILURE_RATE"]
+        self.slow_call_seconds = config["SLOW_CALL_SECONDS"]
+        self.slow_call_rate = config["SLOW_CALL_RATE"]
+        self.open_seconds = config["OPEN_SECONDS"]
+        self.half_open_probes = config["HALF_OPEN_PROBES"]
+
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def before_call(self):
+        """
+        Reserve permission for one upstream call
+
+        Raises:
+            CircuitOpenError: If the breaker is open or its probes are taken
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.slug, remaining)
+                self.state = HALF_OPEN
+                self._probes = 0
+
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.slug, self.open_seconds)
+                self._probes += 1
+
+    def record(self, success, duration):
+        """
+        Record the outcome of a call allowed by before_call()
+
+        Args:
+            success: False for network errors and n8n 5xx answers
+            duration: Seconds the call took
+        """
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                if success and not slow:
+                    self._close()
+                else:
+                    self._open(now)
+                return
+
+            self._outcomes.append((now, not success, slow))
+            self._trim(now)
+            if self._should_open():
+                self._open(now)
+
+    def snapshot(self):
+        """Return the breaker's state and current window rates"""
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._outcomes)
+            failures = sum(1 for _, failed, _ in self._outcomes if failed)
+            slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": failures / calls if calls else 0.0,
+            "slow_call_rate": slow / calls if calls else 0.0,
+            "rejected": self.rejected,
+        }
+
+    def _trim(self, now):
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _should_open(self):
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return False
+        failures = sum(1 for _, failed, _ in self._outcomes if failed)
+        slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+        return failures / calls >= self.failure_rate or slow / calls >= self.slow_call_rate
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def for_slug(slug, host=None):
+    """
+    Return the circuit breaker for a workflow slug
+
+    Options come from settings.N8N_CIRCUIT_BREAKER, overridden per slug by
+    settings.N8N_CIRCUIT_BREAKERS[slug]; a slug mapped to None has no breaker.
+
+    Args:
+        slug: Workflow identifier
+        host: n8n instance of a load-balanced slug, which gets a breaker of its
+            own so one failing instance doesn't open the circuit for the others
+
+    Returns:
+        CircuitBreaker: Breaker for the slug (or instance), or None if disabled
+    """
+    overrides = getattr(settings, 'N8N_CIRCUIT_BREAKERS', {})
+    if slug in overrides and overrides[slug] is None:
+        return None
+
+    options = {**getattr(settings, 'N8N_CIRCUIT_BREAKER', {}), **(overrides.get(slug) or {})}
+    key = slug if host is None else (slug, host)
+    cached = _breakers.get(key)
+    if cached is not None and cached[0] == options:
+        return cached[1]
+
+    with _breakers_lock:
+        cached = _breakers.get(key)
+        if cached is None or cached[0] != options:
+            cached = _breakers[key] = (options, CircuitBreaker(slug, host, **options))
+    return cached[1]
+
+
+def timeout_for(slug):
+    """
+    Return the (connect, read) timeout in seconds for a workflow slug
+
+    Timeouts set on the slug's Workflow registry row win; otherwise falls back
+    to settings.N8N_TIMEOUT when the slug has no entry in settings.N8N_TIMEOUTS.
+    """
+    timeout = getattr(settings, 'N8N_TIMEOUTS', {}).get(slug, getattr(settings, 'N8N_TIMEOUT', (3.05, 10)))
+    if isinstance(timeout, (int, float)):
+        timeout = (timeout, timeout)
+    connect_timeout, read_timeout = timeout
+
+    entry = registry.workflows.get(slug, refresh=False)
+    if entry is not None:
+        connect_timeout = entry.connect_timeout or connect_timeout
+        read_timeout = entry.read_timeout or read_timeout
+    return (connect_timeout, read_timeout)
+
+
+def breaker_stats():
+    """Return a snapshot of every slug breaker created so far (instance breakers are in api.load_balancer's)"""
+    return {key: breaker.snapshot() for key, (_, breaker) in list(_breakers.items()) if breaker.host is None}
+
+
+def state(slug, host=None):
+    """Return the state of a breaker created so far, or None"""
+    cached = _breakers.get(slug if host is None else (slug, host))
+    return cached[1].state if cached is not None else None
+
+
+def reset_breakers():
+    """Forget every breaker (used in tests)"""
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,306 @@
+"""
+Content-Encoding support for the API
+Negotiates gzip/brotli/zstd response compression, inflates compressed request bodies and compresses n8n call bodies
+"""
+import io
+import re
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import validation
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+
+_COMPRESSIBLE = re.compile(r'^(text/.*|application/(javascript|.*json|.*xml))$')
+
+
+class BodyTooLarge(Exception):
+    """Raised when a compressed request body inflates beyond the allowed size"""
+
+
+class _Encoder:
+    """Streaming compressor; chunk() returns output flushed so far, finish() the rest"""
+
+    def __init__(self, compress, flush, finish):
+        self._compress = compress
+        self._flush = flush
+        self._finish = finish
+
+    def chunk(self, data):
+        return self._compress(data) + self._flush()
+
+    def finish(self):
+        return self._finish()
+
+
+def _gzip_encoder(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return _Encoder(compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush)
+
+
+def _brotli_encoder(level):
+    compressor = brotli.Compressor(quality=level)
+    return _Encoder(compressor.process, compressor.flush, compressor.finish)
+
+
+def _zstd_encoder(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return _Encoder(
+        compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+    )
+
+
+def _zlib_decode(data, limit):
+    # wbits 47 accepts both gzip and zlib ("deflate") framing
+    decompressor = zlib.decompressobj(47)
+    output = decompressor.decompress(data, limit + 1)
+    if not decompressor.eof and not decompressor.unconsumed_tail:
+        raise ValueError("Truncated compressed body")
+    return output
+
+
+def _brotli_decode(data, limit):
+    # The output buffer stops growing at limit + 1 bytes, however small the input
+    return brotli.Decompressor().process(data, output_buffer_limit=limit + 1)
+
+
+def _zstd_decode(data, limit):
+    return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read(limit + 1)
+
+
+_DECODE_ERRORS = (
+    (ValueError, zlib.error)
+    + ((brotli.error,) if brotli is not None else ())
+    + ((zstandard.ZstdError,) if zstandard is not None else ())
+)
+
+
+def _encoders():
+    encoders = {"gzip": _gzip_encoder}
+    if brotli is not None:
+        encoders["br"] = _brotli_encoder
+    if zstandard is not None:
+        encoders["zstd"] = _zstd_encoder
+    return encoders
+
+
+def _decoders():
+    decoders = {"gzip": _zlib_decode, "x-gzip": _zlib_decode, "deflate": _zlib_decode}
+    # Older brotli releases can't bound a decoder's output, so their bodies aren't accepted
+    if brotli is not None and hasattr(brotli.Decompressor, "can_accept_more_data"):
+        decoders["br"] = _brotli_decode
+    if zstandard is not None:
+        decoders["zstd"] = _zstd_decode
+    return decoders
+
+
+def encoder(encoding):
+    """
+    Return a streaming encoder for a Content-Encoding
+
+    Raises:
+        KeyError: If the encoding isn't supported, or its package isn't installed
+    """
+    level = {**DEFAULT_LEVELS, **getattr(settings, 'COMPRESSION_LEVELS', {})}[encoding]
+    return _encoders()[encoding](level)
+
+
+def compress(data, encoding):
+    """Compress a whole body with one of the supported encodings"""
+    body_encoder = encoder(encoding)
+    return body_encoder.chunk(data) + body_encoder.finish()
+
+
+def decompress(data, encoding, limit):
+    """
+    Inflate a request body
+
+    Raises:
+        KeyError: If the encoding isn't supported
+        BodyTooLarge: If the body inflates beyond `limit` bytes
+        ValueError, zlib.error, brotli.error, zstandard.ZstdError: If the body is corrupt
+    """
+    output = _decoders()[encoding](data, limit)
+    if len(output) > limit:
+        raise BodyTooLarge()
+    return output
+
+
+def negotiate(accept_encoding, offered):
+    """
+    Pick a response encoding from an Accept-Encoding header
+
+    Args:
+        accept_encoding: Header value, e.g. "gzip, br;q=0.9, *;q=0"
+        offered: Encodings in the server's order of preference
+
+    Returns:
+        str: The offered encoding with the highest q-value (ties go to the
+            server's preference), or None for an uncompressed answer
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().lower().partition(";")
+        if not name:
+            continue
+        weight = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                weight = float(match.group(1))
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in offered:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _offered():
+    available = _encoders()
+    return [name for name in getattr(settings, 'COMPRESSION_ENCODINGS', ("gzip",)) if name in available]
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses and inflates compressed request bodies
+
+    Responses are compressed when the client accepts one of
+    settings.COMPRESSION_ENCODINGS, the body is text, JSON or XML, and a
+    buffered body is at least COMPRESSION_MIN_SIZE bytes. Streaming responses
+    are compressed chunk by chunk, each flushed so relays don't stall.
+
+    Request bodies sent with Content-Encoding gzip, deflate, br or zstd are
+    inflated before the view reads them. Decoding stops as soon as the output
+    passes the largest trigger body allowed (N8N_MAX_BODY_SIZE or an
+    N8N_PAYLOAD_LIMITS entry), or COMPRESSION_MAX_REQUEST_SIZE if that is lower.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        rejection = self.decode_request(request)
+        if rejection is not None:
+            return rejection
+        return self.encode_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        rejection = self.decode_request(request)
+        if rejection is not None:
+            return rejection
+        return self.encode_response(request, await self.get_response(request))
+
+    def decode_request(self, request):
+        """Swap a compressed request body for its inflated bytes; returns an error response if it can't"""
+        encoding = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return None
+        if encoding not in _decoders():
+            return JsonResponse({"error": f"Unsupported Content-Encoding: {encoding}"}, status=415)
+
+        limit = min(getattr(settings, 'COMPRESSION_MAX_REQUEST_SIZE', 10 * 1024 * 1024), validation.largest_body_size())
+        try:
+            body = decompress(request.body, encoding, limit)
+        except (RequestDataTooBig, BodyTooLarge):
+            return JsonResponse({"error": "Request body too large"}, status=413)
+        except _DECODE_ERRORS:
+            return JsonResponse({"error": "Invalid compressed request body"}, status=400)
+
+        request._body = body
+        request._stream = io.BytesIO(body)
+        request.META['CONTENT_LENGTH'] = str(len(body))
+        del request.META['HTTP_CONTENT_ENCODING']
+        return None
+
+    def encode_response(self, request, response):
+        """Compress a response with the best encoding the client accepts, when it's worth it"""
+        if response.has_header('Content-Encoding') or 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        media_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not _COMPRESSIBLE.match(media_type):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), _offered())
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            body_encoder = encoder(encoding)
+            if response.is_async:
+                response.streaming_content = _aencode_stream(body_encoder, response.streaming_content)
+            else:
+                response.streaming_content = _encode_stream(body_encoder, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed bytes differ from the original ones, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+
+def _encode_stream(body_encoder, chunks):
+    for chunk in chunks:
+        data = body_encoder.chunk(chunk)
+        if data:
+            yield data
+    yield body_encoder.finish()
+
+
+async def _aencode_stream(body_encoder, chunks):
+    async for chunk in chunks:
+        data = body_encoder.chunk(chunk)
+        if data:
+            yield data
+    yield body_encoder.finish()
+
+
+def encode_request_body(body):
+    """
+    Compress an outbound n8n body with settings.N8N_REQUEST_ENCODING
+
+    Returns:
+        tuple: (body, Content-Encoding), with None as the encoding when the body is sent as is
+    """
+    encoding = getattr(settings, 'N8N_REQUEST_ENCODING', None)
+    if not encoding or len(body) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+        return body, None
+    return compress(body, encoding), encoding
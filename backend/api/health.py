@@ -0,0 +1,186 @@
+"""
+Liveness and readiness endpoints
+Answered by a middleware ahead of the rest of the stack; readiness reports cached background probes of the n8n hosts
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import fast_json, n8n_client, registry
+
+logger = logging.getLogger(__name__)
+
+LIVENESS_BODY = fast_json.dumps({"status": "ok", "version": "1.0.0"})
+
+
+def webhook_hosts():
+    """Distinct scheme://host[:port] of the webhooks in settings.N8N_WEBHOOKS"""
+    hosts = set()
+    for value in getattr(settings, 'N8N_WEBHOOKS', {}).values():
+        for url in registry.webhook_urls(value):
+            parts = urlsplit(url)
+            hosts.add(f"{parts.scheme}://{parts.netloc}".lower())
+    return sorted(hosts)
+
+
+def _probe_url(host):
+    return host + getattr(settings, 'HEALTH_N8N_PROBE_PATH', '/healthz')
+
+
+def probe(host):
+    """
+    Check that an n8n host answers
+
+    Any answer below 500 counts: the host is reachable and n8n (not a proxy
+    in front of it) is responding.
+
+    Returns:
+        dict: {"up", "status", "latency_ms"} plus "error" when the host couldn't be reached
+    """
+    started = time.monotonic()
+    try:
+        resp = n8n_client.get(
+            _probe_url(host), timeout=getattr(settings, 'HEALTH_PROBE_TIMEOUT', 2), allow_redirects=False
+        )
+    except Exception as e:
+        return {
+            "up": False,
+            "status": None,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            "error": type(e).__name__,
+        }
+    resp.close()
+    return {
+        "up": resp.status_code < 500,
+        "status": resp.status_code,
+        "latency_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+class ReadinessProbe:
+    """
+    Probes every n8n host in settings.N8N_WEBHOOKS and keeps the rendered result
+
+    A readiness check answers from the last result. Once that is older than
+    settings.HEALTH_PROBE_TTL, the check starts a refresh in a background
+    thread and still answers at once, so frequent polling never waits on n8n
+    and costs at most one round of probes per TTL. Only the very first check
+    waits for a round.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0.0
+        self._refreshing = False
+
+    def response(self):
+        """Return the readiness answer as (HTTP status, body bytes)"""
+        if self._result is None:
+            self.refresh()
+        elif time.monotonic() - self._checked_at >= getattr(settings, 'HEALTH_PROBE_TTL', 10):
+            self._refresh_in_background()
+        return self._result
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="readiness-probe", daemon=True).start()
+
+    def refresh(self):
+        """Probe every host now and store the rendered result"""
+        try:
+            hosts = webhook_hosts()
+            if hosts:
+                with ThreadPoolExecutor(max_workers=min(len(hosts), 8), thread_name_prefix="readiness") as executor:
+                    results = list(executor.map(probe, hosts))
+            else:
+                results = []
+            down = [host for host, result in zip(hosts, results) if not result["up"]]
+            if down:
+                logger.warning("Not ready, n8n hosts down: %s", ", ".join(down))
+            # The answer is public, so hosts are only named in the log; the
+            # body lists their results in webhook_hosts() order
+            body = fast_json.dumps({
+                "status": "unavailable" if down else "ready",
+                "checked_at": time.time(),
+                "hosts": results,
+            })
+            self._result = (503 if down else 200, body)
+            self._checked_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def reset(self):
+        """Forget the last result (used in tests)"""
+        with self._lock:
+            self._result = None
+            self._checked_at = 0.0
+            self._refreshing = False
+
+
+readiness = ReadinessProbe()
+
+
+class HealthCheckMiddleware:
+    """
+    Answers liveness and readiness checks before any other middleware runs
+
+    Load balancers poll these paths often, so they skip sessions, CSRF,
+    authentication, tracing and DRF content negotiation, and return
+    pre-rendered bytes. Must come first in settings.MIDDLEWARE.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in ('GET', 'HEAD'):
+            if request.path == getattr(settings, 'HEALTH_LIVENESS_PATH', '/api/healthz/'):
+                return _health_response(200, LIVENESS_BODY)
+            if request.path == getattr(settings, 'HEALTH_READINESS_PATH', '/api/readyz/'):
+                return _health_response(*readiness.response())
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method in ('GET', 'HEAD'):
+            if request.path == getattr(settings, 'HEALTH_LIVENESS_PATH', '/api/healthz/'):
+                return _health_response(200, LIVENESS_BODY)
+            if request.path == getattr(settings, 'HEALTH_READINESS_PATH', '/api/readyz/'):
+                # Only the first check probes synchronously; later ones return at once
+                return _health_response(*await sync_to_async(readiness.response)())
+        return await self.get_response(request)
+
+
+def _health_response(status_code, body):
+    response = HttpResponse(body, status=status_code, content_type="application/json")
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def _reset_after_fork():
+    # A refresh running in the parent doesn't exist in the child
+    readiness._lock = threading.Lock()
+    readiness._refreshing = False
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,633 @@
+"""
+Background job mode for n8n workflow triggers
+Queues enriched payloads in a pluggable store and forwards them from a bounded worker pool
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+# Handed to n8n in callback mode; finished by n8n's call to the callback URL
+WAITING = "waiting"
+
+FINISHED = (SUCCEEDED, FAILED)
+
+
+DEFAULT_RETRY_POLICY = {
+    "MAX_ATTEMPTS": 8,
+    "BASE_DELAY": 2.0,
+    "MAX_DELAY": 300.0,
+}
+
+
+class QueueFull(Exception):
+    """Raised when the job queue already holds the maximum number of pending jobs"""
+
+
+class RetryableError(Exception):
+    """
+    Raised by an executor when n8n couldn't take a job but may later
+
+    Jobs of at-least-once slugs are retried; other jobs fail with http_status and result.
+
+    Args:
+        http_status: Status to record if the job isn't retried
+        result: Response data to record if the job isn't retried
+        retry_after: Minimum seconds before the next attempt
+    """
+
+    def __init__(self, http_status, result, retry_after=0):
+        super().__init__(f"Retryable failure ({http_status})")
+        self.http_status = http_status
+        self.result = result
+        self.retry_after = retry_after
+
+
+class AwaitingCallback(Exception):
+    """
+    Raised by an executor once n8n has accepted a callback-mode job
+
+    The job waits for n8n to report its result instead of being finished.
+
+    Args:
+        http_status: Status of n8n's acknowledgement
+        result: Body of n8n's acknowledgement
+    """
+
+    def __init__(self, http_status, result):
+        super().__init__(f"Awaiting callback ({http_status})")
+        self.http_status = http_status
+        self.result = result
+
+
+def new_job_id():
+    """Return a fresh job id, also sent to n8n as the delivery id"""
+    return uuid.uuid4().hex
+
+
+def job_token(job_id):
+    """
+    Secret letting the anonymous caller who queued a job read it
+
+    Keyed with the Django SECRET_KEY, so n8n, which sees job ids as delivery
+    ids, can't derive it.
+    """
+    return signing.Signer(salt="api.jobs.token").signature(job_id)
+
+
+def retry_policy(slug):
+    """
+    Return the retry options of an at-least-once slug
+
+    Defaults come from settings.N8N_RETRY_POLICY, overridden by the slug's entry
+    in settings.N8N_AT_LEAST_ONCE_WORKFLOWS.
+
+    Returns:
+        dict: MAX_ATTEMPTS, BASE_DELAY and MAX_DELAY, or None if the slug isn't at-least-once
+    """
+    workflows = getattr(settings, 'N8N_AT_LEAST_ONCE_WORKFLOWS', {})
+    if slug not in workflows:
+        return None
+    return {**DEFAULT_RETRY_POLICY, **getattr(settings, 'N8N_RETRY_POLICY', {}), **(workflows[slug] or {})}
+
+
+def backoff(policy, attempt):
+    """
+    Seconds to wait after a failed attempt (1 for the first)
+
+    Exponential with "equal jitter": at least half the capped delay, so retries
+    of jobs that failed together spread out without any coming back at once.
+    """
+    delay = min(policy["MAX_DELAY"], policy["BASE_DELAY"] * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class JobStore:
+    """
+    Interface for job queue backends
+
+    A store persists jobs and hands each queued job to exactly one worker,
+    even when several processes share it. A claimed job is leased to its
+    worker; if the worker dies before finishing it, the job is handed out
+    again once the lease runs out.
+    """
+
+    def enqueue(self, slug, webhook_url, payload, user_id=None, job_id=None, delay=0, attempts=0):
+        """Persist a new job, due in `delay` seconds, and return its id"""
+        raise NotImplementedError
+
+    def claim(self, lease=300):
+        """Atomically lease the next due job for `lease` seconds, count the attempt and return it, or None"""
+        raise NotImplementedError
+
+    def finish(self, job_id, state, http_status, result):
+        """Record the outcome of a job"""
+        raise NotImplementedError
+
+    def retry(self, job_id, delay, http_status, result):
+        """Queue a claimed job again, due in `delay` seconds, keeping the outcome of the failed attempt"""
+        raise NotImplementedError
+
+    def dead_letter(self, job_id, http_status, result):
+        """Fail a job for good and copy it to the dead letters"""
+        raise NotImplementedError
+
+    def await_callback(self, job_id, http_status, result):
+        """Park a claimed job until n8n calls back; a no-op if the callback already arrived"""
+        raise NotImplementedError
+
+    def complete(self, job_id, state, http_status, result):
+        """Record the outcome n8n called back with; returns False if the job doesn't exist or already finished"""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def pending_count(self):
+        """Return the number of queued jobs, including those waiting for a retry"""
+        raise NotImplementedError
+
+    def dead_letter_count(self):
+        """Return the number of dead-lettered jobs"""
+        raise NotImplementedError
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store, suitable for a single worker process and tests"""
+
+    def __init__(self, **options):
+        self._jobs = {}
+        self._dead_letters = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, slug, webhook_url, payload, user_id=None, job_id=None, delay=0, attempts=0):
+        job_id = job_id or new_job_id()
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "slug": slug,
+                "webhook_url": webhook_url,
+                "payload": payload,
+                "user_id": user_id,
+                "status": QUEUED,
+                "http_status": None,
+                "result": None,
+                "attempts": attempts,
+                "run_at": now + delay,
+                "created_at": now,
+                "updated_at": now,
+            }
+        return job_id
+
+    def claim(self, lease=300):
+        now = time.time()
+        with self._lock:
+            due = [
+                job for job in self._jobs.values()
+                if job["status"] in (QUEUED, RUNNING) and job["run_at"] <= now
+            ]
+            if not due:
+                return None
+            job = min(due, key=lambda item: (item["run_at"], item["created_at"]))
+            job.update(status=RUNNING, attempts=job["attempts"] + 1, run_at=now + lease, updated_at=now)
+            return dict(job)
+
+    def finish(self, job_id, state, http_status, result):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=state, http_status=http_status, result=result, updated_at=time.time())
+
+    def retry(self, job_id, delay, http_status, result):
+        now = time.time()
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=QUEUED, http_status=http_status, result=result, run_at=now + delay, updated_at=now)
+
+    def dead_letter(self, job_id, http_status, result):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=FAILED, http_status=http_status, result=result, updated_at=time.time())
+            self._dead_letters[job_id] = dict(job)
+
+    def await_callback(self, job_id, http_status, result):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] == RUNNING:
+                job.update(status=WAITING, http_status=http_status, result=result, updated_at=time.time())
+
+    def complete(self, job_id, state, http_status, result):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in (RUNNING, WAITING):
+                return False
+            job.update(status=state, http_status=http_status, result=result, updated_at=time.time())
+            return True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] == QUEUED)
+
+    def dead_letter_count(self):
+        with self._lock:
+            return len(self._dead_letters)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite-backed store shared by every worker process on the host
+
+    Jobs are claimed inside an IMMEDIATE transaction so that concurrent
+    workers never pick up the same job. Jobs that run out of retries are
+    copied to the workflow_dead_letters table.
+    """
+
+    def __init__(self, path=None, **options):
+        self.path = str(path or settings.BASE_DIR / 'jobs.sqlite3')
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS workflow_jobs (
+                    id TEXT PRIMARY KEY,
+                    slug TEXT NOT NULL,
+                    webhook_url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    user_id INTEGER,
+                    status TEXT NOT NULL,
+                    http_status INTEGER,
+                    result TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    run_at REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Stores created before retries existed lack the retry columns
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(workflow_jobs)")}
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE workflow_jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE workflow_jobs ADD COLUMN run_at REAL NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS workflow_jobs_due ON workflow_jobs (status, run_at)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS workflow_dead_letters (
+                    id TEXT PRIMARY KEY,
+                    slug TEXT NOT NULL,
+                    webhook_url TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    user_id INTEGER,
+                    attempts INTEGER NOT NULL,
+                    http_status INTEGER,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    failed_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def enqueue(self, slug, webhook_url, payload, user_id=None, job_id=None, delay=0, attempts=0):
+        job_id = job_id or new_job_id()
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO workflow_jobs"
+                " (id, slug, webhook_url, payload, user_id, status, attempts, run_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, slug, webhook_url, json.dumps(payload), user_id, QUEUED, attempts, now + delay, now, now)
+            )
+        return job_id
+
+    def claim(self, lease=300):
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT * FROM workflow_jobs WHERE status IN (?, ?) AND run_at <= ?"
+                " ORDER BY run_at, created_at LIMIT 1",
+                (QUEUED, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE workflow_jobs SET status = ?, attempts = attempts + 1, run_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, now + lease, now, row["id"])
+            )
+        return self._to_dict(row, status=RUNNING, attempts=row["attempts"] + 1, run_at=now + lease)
+
+    def finish(self, job_id, state, http_status, result):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE workflow_jobs SET status = ?, http_status = ?, result = ?, updated_at = ? WHERE id = ?",
+                (state, http_status, json.dumps(result), time.time(), job_id)
+            )
+
+    def retry(self, job_id, delay, http_status, result):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE workflow_jobs SET status = ?, http_status = ?, result = ?, run_at = ?, updated_at = ?"
+                " WHERE id = ?",
+                (QUEUED, http_status, json.dumps(result), now + delay, now, job_id)
+            )
+
+    def dead_letter(self, job_id, http_status, result):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE workflow_jobs SET status = ?, http_status = ?, result = ?, updated_at = ? WHERE id = ?",
+                (FAILED, http_status, json.dumps(result), now, job_id)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO workflow_dead_letters"
+                " (id, slug, webhook_url, payload, user_id, attempts, http_status, result, created_at, failed_at)"
+                " SELECT id, slug, webhook_url, payload, user_id, attempts, http_status, result, created_at, ?"
+                " FROM workflow_jobs WHERE id = ?",
+                (now, job_id)
+            )
+
+    def await_callback(self, job_id, http_status, result):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE workflow_jobs SET status = ?, http_status = ?, result = ?, updated_at = ?"
+                " WHERE id = ? AND status = ?",
+                (WAITING, http_status, json.dumps(result), time.time(), job_id, RUNNING)
+            )
+
+    def complete(self, job_id, state, http_status, result):
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE workflow_jobs SET status = ?, http_status = ?, result = ?, updated_at = ?"
+                " WHERE id = ? AND status IN (?, ?)",
+                (state, http_status, json.dumps(result), time.time(), job_id, RUNNING, WAITING)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM workflow_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def pending_count(self):
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workflow_jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+
+    def dead_letter_count(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM workflow_dead_letters").fetchone()[0]
+
+    @staticmethod
+    def _to_dict(row, **overrides):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job.update(overrides)
+        return job
+
+
+class _Transaction:
+    """Context manager running a block inside BEGIN IMMEDIATE ... COMMIT"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class JobQueue:
+    """
+    Bounded in-process worker pool draining a JobStore
+
+    When the executor raises RetryableError for a job of an at-least-once
+    slug, the job is queued again with exponential backoff until it runs out
+    of attempts and is dead-lettered. When it raises AwaitingCallback, the
+    job waits for n8n's callback instead of being finished.
+
+    Args:
+        store: JobStore holding the jobs
+        executor: Callable(job) -> (http_status, result) that forwards a job to n8n
+        workers: Number of worker threads; 0 means jobs only run via drain()
+        max_pending: Maximum number of queued jobs before enqueue is refused
+        lease: Seconds a claimed job stays with its worker before it is handed out again
+    """
+
+    def __init__(self, store, executor, workers=4, max_pending=1000, lease=300):
+        self.store = store
+        self.executor = executor
+        self.workers = workers
+        self.max_pending = max_pending
+        self.lease = lease
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, slug, webhook_url, payload, user_id=None, job_id=None, delay=0, attempts=0):
+        """
+        Queue a job and wake a worker
+
+        Args:
+            job_id: Id to store the job under instead of a fresh one
+            delay: Seconds before the job is due
+            attempts: Deliveries already tried elsewhere, counted against the retry limit
+
+        Returns:
+            str: Job id
+
+        Raises:
+            QueueFull: If max_pending jobs are already waiting
+        """
+        if self.store.pending_count() >= self.max_pending:
+            raise QueueFull()
+        job_id = self.store.enqueue(
+            slug, webhook_url, payload, user_id=user_id, job_id=job_id, delay=delay, attempts=attempts
+        )
+        self._ensure_workers()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def run_one(self):
+        """Claim and run a single due job; return False when no job is due"""
+        job = self.store.claim(self.lease)
+        if job is None:
+            return False
+        try:
+            http_status, result = self.executor(job)
+            state = SUCCEEDED if http_status < 400 else FAILED
+        except AwaitingCallback as e:
+            self.store.await_callback(job["id"], e.http_status, e.result)
+            _count_run(job, "awaiting_callback")
+            return True
+        except RetryableError as e:
+            http_status, result, state = e.http_status, e.result, FAILED
+            policy = retry_policy(job["slug"])
+            if policy is not None:
+                self._retry_or_bury(job, policy, e)
+                return True
+        except Exception:
+            logger.exception("Workflow job %s crashed", job["id"], extra={"slug": job["slug"]})
+            http_status, result, state = 500, {"error": "Workflow job failed"}, FAILED
+        self.store.finish(job["id"], state, http_status, result)
+        _count_run(job, state)
+        notify(job["id"])
+        return True
+
+    def _retry_or_bury(self, job, policy, error):
+        if job["attempts"] < policy["MAX_ATTEMPTS"]:
+            delay = max(backoff(policy, job["attempts"]), error.retry_after)
+            logger.warning(
+                "Workflow job %s (%s) failed attempt %s with %s, retrying in %.1fs",
+                job["id"], job["slug"], job["attempts"], error.http_status, delay, extra={"slug": job["slug"]}
+            )
+            self.store.retry(job["id"], delay, error.http_status, error.result)
+            _count_run(job, "retried")
+        else:
+            logger.error(
+                "Workflow job %s (%s) failed %s attempts, dead-lettering it",
+                job["id"], job["slug"], job["attempts"], extra={"slug": job["slug"]}
+            )
+            self.store.dead_letter(job["id"], error.http_status, error.result)
+            _count_run(job, "dead_lettered")
+            notify(job["id"])
+
+    def drain(self):
+        """Run queued jobs on the calling thread until none are left"""
+        while self.run_one():
+            pass
+
+    def _ensure_workers(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self.run_forever, name=f"n8n-job-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def run_forever(self):
+        """Run jobs on the calling thread as they become due"""
+        while True:
+            if self.run_one():
+                continue
+            with self._wakeup:
+                # Poll periodically as well, so retries coming due and jobs queued by other processes are picked up
+                self._wakeup.wait(timeout=1.0)
+
+
+def _count_run(job, outcome):
+    metrics.registry.inc("n8n_job_runs_total", (("slug", job["slug"]), ("outcome", outcome)))
+
+
+# Clients waiting for a job to finish -------------------------------------------
+
+_waiters = {}
+_waiters_lock = threading.Lock()
+
+
+def add_waiter(job_id, wake):
+    """Call `wake()` when this process finishes the job (other processes' updates are only seen by polling)"""
+    with _waiters_lock:
+        _waiters.setdefault(job_id, set()).add(wake)
+
+
+def remove_waiter(job_id, wake):
+    """Undo add_waiter()"""
+    with _waiters_lock:
+        waiters = _waiters.get(job_id)
+        if waiters is not None:
+            waiters.discard(wake)
+            if not waiters:
+                del _waiters[job_id]
+
+
+def notify(job_id):
+    """Wake everything in this process waiting for a job"""
+    with _waiters_lock:
+        waiters = list(_waiters.get(job_id, ()))
+    for wake in waiters:
+        wake()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide JobQueue, building it from settings on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                store_class = import_string(getattr(settings, 'N8N_JOB_STORE', 'api.jobs.SQLiteJobStore'))
+                store = store_class(**getattr(settings, 'N8N_JOB_STORE_OPTIONS', {}))
+                _queue = JobQueue(
+                    store,
+                    executor=import_string(getattr(settings, 'N8N_JOB_EXECUTOR', 'api.views.run_workflow_job')),
+                    workers=getattr(settings, 'N8N_JOB_WORKERS', 4),
+                    max_pending=getattr(settings, 'N8N_JOB_MAX_PENDING', 1000),
+                    lease=getattr(settings, 'N8N_JOB_LEASE_SECONDS', 300),
+                )
+    return _queue
+
+
+def reset_job_queue():
+    """Forget the process-wide JobQueue so it is rebuilt from settings (used in tests)"""
+    global _queue
+    with _queue_lock:
+        _queue = None
+
+
+def _reset_after_fork():
+    # Worker threads don't survive fork; let each child build its own pool
+    global _queue, _queue_lock, _waiters, _waiters_lock
+    _queue_lock = threading.Lock()
+    _queue = None
+    _waiters_lock = threading.Lock()
+    _waiters = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,375 @@
+"""
+Load balancing across n8n instances
+Spreads a slug's triggers over a pool of webhook URLs, ejects failing instances and retries connect failures elsewhere
+"""
+import logging
+import math
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from urllib3.exceptions import NewConnectionError
+
+from . import circuit_breaker, metrics, registry
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_IN_FLIGHT = "least_in_flight"
+EWMA = "ewma"
+
+DEFAULT_BALANCER = {
+    "STRATEGY": ROUND_ROBIN,        # round_robin, least_in_flight or ewma (latency-weighted)
+    "FAILURES_TO_EJECT": 5,         # Consecutive failed calls that take an instance out of the pool
+    "EJECT_SECONDS": 30,            # First ejection; doubles for each ejection in a row
+    "MAX_EJECT_SECONDS": 300,
+    "MAX_EJECTED_PERCENT": 50,      # Share of the pool that may be ejected at once
+    "CONNECT_RETRIES": 1,           # Other instances tried when one can't be connected to
+    "EWMA_DECAY_SECONDS": 10,       # Time for an old latency sample to fade to ~37% of its weight
+    "FAILURE_PENALTY_SECONDS": 5,   # Latency a failed call counts as in the EWMA
+}
+
+
+class Endpoint:
+    """One n8n webhook URL of a pool and what the balancer knows about it"""
+
+    __slots__ = (
+        "url", "host", "origin", "in_flight", "latency", "sampled_at", "failures", "ejections", "ejected_until", "calls"
+    )
+
+    def __init__(self, url):
+        self.url = url
+        parts = urlsplit(url)
+        self.host = parts.netloc
+        # Webhook paths are secret, so only the origin is ever reported
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.in_flight = 0
+        self.latency = 0.0
+        self.sampled_at = None
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.calls = 0
+
+    def ejected(self, now):
+        return self.ejected_until > now
+
+
+class UpstreamPool:
+    """
+    Picks the webhook URL each call of a slug goes to
+
+    round_robin cycles through the instances; least_in_flight picks the one
+    with the fewest calls under way; ewma picks the lowest decayed average
+    latency times (calls under way + 1), so slow or busy instances get less.
+
+    Failed calls (network errors and 5xx answers) are counted per instance;
+    after FAILURES_TO_EJECT in a row the instance is skipped for EJECT_SECONDS,
+    doubling each time it is ejected again before a call succeeds. At most
+    MAX_EJECTED_PERCENT of the pool is ejected at once, and when every
+    instance is ejected they are all tried rather than failing the call.
+    """
+
+    def __init__(self, slug, urls, **options):
+        self.slug = slug
+        config = {**DEFAULT_BALANCER, **options}
+        self.strategy = config["STRATEGY"]
+        if self.strategy not in (ROUND_ROBIN, LEAST_IN_FLIGHT, EWMA):
+            raise ValueError(f"Unknown load balancing strategy for '{slug}': {self.strategy}")
+        self.failures_to_eject = config["FAILURES_TO_EJECT"]
+        self.eject_seconds = config["EJECT_SECONDS"]
+        self.max_eject_seconds = config["MAX_EJECT_SECONDS"]
+        self.max_ejected = math.floor(len(urls) * config["MAX_EJECTED_PERCENT"] / 100)
+        self.connect_retries = config["CONNECT_RETRIES"]
+        self.decay_seconds = config["EWMA_DECAY_SECONDS"]
+        self.failure_penalty = config["FAILURE_PENALTY_SECONDS"]
+
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude=()):
+        """
+        Pick an instance for a call and count it as in flight
+
+        Args:
+            exclude: Endpoints already tried for this call
+
+        Returns:
+            Endpoint: The instance to call, or None when every one was excluded
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            healthy = [endpoint for endpoint in candidates if not endpoint.ejected(now)]
+            candidates = healthy or candidates
+            if not candidates:
+                return None
+
+            if self.strategy == ROUND_ROBIN:
+                endpoint = candidates[self._next % len(candidates)]
+                self._next += 1
+            elif self.strategy == LEAST_IN_FLIGHT:
+                fewest = min(endpoint.in_flight for endpoint in candidates)
+                endpoint = random.choice([endpoint for endpoint in candidates if endpoint.in_flight == fewest])
+            else:
+                endpoint = min(candidates, key=lambda endpoint: (self._score(endpoint, now), random.random()))
+            endpoint.in_flight += 1
+            endpoint.calls += 1
+            return endpoint
+
+    def _score(self, endpoint, now):
+        # Untried instances score 0, so each gets a first call
+        return self._decayed_latency(endpoint, now) * (endpoint.in_flight + 1)
+
+    def _decayed_latency(self, endpoint, now):
+        if endpoint.sampled_at is None:
+            return 0.0
+        return endpoint.latency * math.exp(-(now - endpoint.sampled_at) / self.decay_seconds)
+
+    def release(self, endpoint, success, duration):
+        """
+        Record the outcome of a call made on an endpoint from acquire()
+
+        Args:
+            endpoint: The endpoint called
+            success: False for network errors and n8n 5xx answers, None for
+                calls abandoned before an outcome (e.g. cancelled)
+            duration: Seconds the call took
+        """
+        with self._lock:
+            now = time.monotonic()
+            endpoint.in_flight -= 1
+            if success is None:
+                return
+            sample = duration if success else max(duration, self.failure_penalty)
+            if endpoint.sampled_at is None:
+                endpoint.latency = sample
+            else:
+                weight = math.exp(-(now - endpoint.sampled_at) / self.decay_seconds)
+                endpoint.latency = endpoint.latency * weight + sample * (1 - weight)
+            endpoint.sampled_at = now
+
+            if success:
+                endpoint.failures = 0
+                endpoint.ejections = 0
+                return
+            endpoint.failures += 1
+            if endpoint.failures < self.failures_to_eject or endpoint.ejected(now):
+                return
+            if sum(1 for other in self.endpoints if other.ejected(now)) >= self.max_ejected:
+                return
+            seconds = min(self.eject_seconds * 2 ** endpoint.ejections, self.max_eject_seconds)
+            endpoint.ejected_until = now + seconds
+            endpoint.ejections += 1
+            endpoint.failures = 0
+
+        logger.warning(
+            "Ejected n8n instance %s of workflow %s for %ss", endpoint.host, self.slug, seconds,
+            extra={"slug": self.slug}
+        )
+        metrics.registry.inc("n8n_upstream_ejections_total", (("slug", self.slug), ("endpoint", endpoint.host)))
+
+    def snapshot(self):
+        """Return each instance's state, by origin (scheme and host)"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "endpoint": endpoint.origin,
+                    "host": endpoint.host,
+                    "in_flight": endpoint.in_flight,
+                    "calls": endpoint.calls,
+                    "latency_ewma": round(self._decayed_latency(endpoint, now), 6),
+                    "ejected": endpoint.ejected(now),
+                    "circuit": circuit_breaker.state(self.slug, endpoint.host),
+                }
+                for endpoint in self.endpoints
+            ]
+
+
+def is_connect_error(error):
+    """
+    Whether a failed call never reached n8n, so it is safe to send again
+
+    Connect timeouts and refused or unresolvable connections qualify; errors
+    after the request went out (read timeouts, dropped connections) don't,
+    since n8n may already be running the workflow.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    # httpx is only imported on the ASGI path
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+def call(slug, url, send):
+    """
+    Run send(url) under the circuit breaker, on an instance picked from the slug's pool
+
+    Slugs with a single URL call it directly under the slug's breaker. In a
+    pool each instance has its own breaker; an instance whose breaker is open
+    is passed over, and when the picked instance can't be connected to, up to
+    CONNECT_RETRIES other instances are tried.
+
+    Args:
+        slug: Workflow identifier
+        url: URL used when the slug has no pool
+        send: Callable making the request, returning a response with a status_code
+
+    Returns:
+        The response of the last call
+
+    Raises:
+        CircuitOpenError: If the breaker is open (of every instance, for a pool)
+    """
+    pool = for_slug(slug) if slug else None
+    if pool is None:
+        return _guarded(circuit_breaker.for_slug(slug) if slug else None, send, url)
+
+    tried = []
+    while True:
+        endpoint = pool.acquire(tried)
+        tried.append(endpoint)
+        started = time.monotonic()
+        try:
+            resp = _guarded(circuit_breaker.for_slug(slug, endpoint.host), send, endpoint.url)
+        except circuit_breaker.CircuitOpenError:
+            # Nothing was sent, so any other instance may take the call
+            pool.release(endpoint, None, 0.0)
+            if len(tried) >= len(pool.endpoints):
+                raise
+            continue
+        except Exception as e:
+            pool.release(endpoint, False, time.monotonic() - started)
+            if not _retry(pool, tried, e):
+                raise
+            continue
+        except BaseException:
+            pool.release(endpoint, None, time.monotonic() - started)
+            raise
+        pool.release(endpoint, resp.status_code < 500, time.monotonic() - started)
+        return resp
+
+
+async def acall(slug, url, send):
+    """Async counterpart of call(); `send` is a coroutine function"""
+    pool = for_slug(slug) if slug else None
+    if pool is None:
+        return await _aguarded(circuit_breaker.for_slug(slug) if slug else None, send, url)
+
+    tried = []
+    while True:
+        endpoint = pool.acquire(tried)
+        tried.append(endpoint)
+        started = time.monotonic()
+        try:
+            resp = await _aguarded(circuit_breaker.for_slug(slug, endpoint.host), send, endpoint.url)
+        except circuit_breaker.CircuitOpenError:
+            pool.release(endpoint, None, 0.0)
+            if len(tried) >= len(pool.endpoints):
+                raise
+            continue
+        except Exception as e:
+            pool.release(endpoint, False, time.monotonic() - started)
+            if not _retry(pool, tried, e):
+                raise
+            continue
+        except BaseException:
+            pool.release(endpoint, None, time.monotonic() - started)
+            raise
+        pool.release(endpoint, resp.status_code < 500, time.monotonic() - started)
+        return resp
+
+
+def _guarded(breaker, send, url):
+    # Network errors, 5xx answers and slow calls count against the breaker
+    if breaker is None:
+        return send(url)
+    breaker.before_call()
+    started = time.monotonic()
+    try:
+        resp = send(url)
+    except BaseException:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(resp.status_code < 500, time.monotonic() - started)
+    return resp
+
+
+async def _aguarded(breaker, send, url):
+    if breaker is None:
+        return await send(url)
+    breaker.before_call()
+    started = time.monotonic()
+    try:
+        resp = await send(url)
+    except BaseException:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(resp.status_code < 500, time.monotonic() - started)
+    return resp
+
+
+def _retry(pool, tried, error):
+    if len(tried) > pool.connect_retries or len(tried) >= len(pool.endpoints) or not is_connect_error(error):
+        return False
+    logger.warning(
+        "Couldn't connect to n8n instance %s of workflow %s, trying another", tried[-1].host, pool.slug,
+        extra={"slug": pool.slug}
+    )
+    metrics.registry.inc("n8n_upstream_retries_total", (("slug", pool.slug),))
+    return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def for_slug(slug):
+    """
+    Return the upstream pool of a workflow slug
+
+    URLs come from the slug's registry entry (a list in settings.N8N_WEBHOOKS).
+    Options come from settings.N8N_LOAD_BALANCER, overridden per slug by
+    settings.N8N_LOAD_BALANCERS[slug].
+
+    Returns:
+        UpstreamPool: Pool for the slug, or None if it has a single URL
+    """
+    entry = registry.workflows.get(slug, refresh=False)
+    if entry is None or len(entry.urls) < 2:
+        return None
+
+    config = (
+        entry.urls,
+        {**getattr(settings, 'N8N_LOAD_BALANCER', {}), **getattr(settings, 'N8N_LOAD_BALANCERS', {}).get(slug, {})},
+    )
+    cached = _pools.get(slug)
+    if cached is not None and cached[0] == config:
+        return cached[1]
+
+    with _pools_lock:
+        cached = _pools.get(slug)
+        if cached is None or cached[0] != config:
+            cached = _pools[slug] = (config, UpstreamPool(slug, config[0], **config[1]))
+    return cached[1]
+
+
+def upstream_stats():
+    """Return a snapshot of every pool created so far"""
+    return {slug: pool.snapshot() for slug, (_, pool) in list(_pools.items())}
+
+
+def reset_pools():
+    """Forget every pool (used in tests)"""
+    with _pools_lock:
+        _pools.clear()
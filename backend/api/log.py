@@ -0,0 +1,183 @@
+"""
+Structured logging for the API
+JSON log lines written by a background thread, so requests only put records on a queue, with per-slug sampling
+"""
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from . import fast_json, metrics, tracing
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "trace_id"}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line
+
+    Fields passed with `extra` (e.g. slug, status) become top-level keys next
+    to time, level, logger and message; values that aren't JSON are written
+    with str().
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        try:
+            return fast_json.dumps(entry).decode()
+        except TypeError:
+            return fast_json.dumps({key: _jsonable(value) for key, value in entry.items()}).decode()
+
+    def formatTime(self, record, datefmt=None):
+        # ISO 8601 in UTC with milliseconds
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    return str(value)
+
+
+def sample_rate(slug):
+    """Share of a slug's INFO and DEBUG records that are kept: settings.LOG_SAMPLE_RATES, else LOG_SAMPLE_RATE"""
+    return getattr(settings, 'LOG_SAMPLE_RATES', {}).get(slug, getattr(settings, 'LOG_SAMPLE_RATE', 1.0))
+
+
+def _draw():
+    # Drawn from the trace id when there is one, so a request's records are kept or dropped together
+    trace_id = tracing.current_trace_id()
+    if trace_id is None:
+        return random.random()
+    return int(trace_id[-8:], 16) / 0x100000000
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background thread that formats and writes them
+
+    The request thread only decides whether to keep a record and puts it on
+    a bounded queue. Message arguments are formatted later by the writer
+    thread, so they mustn't be mutated after the logging call. When the queue
+    is full the record is dropped and counted rather than blocking.
+
+    Records below WARNING that carry a `slug` extra are sampled per slug (see
+    sample_rate()), all of a request's or none; warnings and errors are always written.
+
+    Args:
+        stream: Stream the JSON lines are written to (sys.stderr by default)
+        max_queue: Records waiting to be written before new ones are dropped
+    """
+
+    def __init__(self, stream=None, max_queue=10000):
+        super().__init__(queue.Queue(max_queue))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JSONFormatter())
+        self._listener = None
+        self._lock = threading.Lock()
+        _handlers.add(self)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the writer thread
+        self.target.setFormatter(fmt)
+
+    def filter(self, record):
+        if not super().filter(record):
+            return False
+        slug = getattr(record, "slug", None)
+        if slug is not None and record.levelno < logging.WARNING:
+            rate = sample_rate(slug)
+            if rate < 1:
+                return _draw() < rate
+        return True
+
+    def prepare(self, record):
+        # Unlike the stdlib, the message isn't formatted here; only what is
+        # bound to the request thread is captured
+        if not hasattr(record, "trace_id"):
+            record.trace_id = tracing.current_trace_id()
+        if record.exc_info:
+            # Tracebacks keep frames alive, so they are rendered now, on a
+            # copy as other handlers may still need the original
+            record = copy.copy(record)
+            if not record.exc_text:
+                record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.registry.inc("n8n_proxy_log_records_dropped_total")
+
+    def _start(self):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+                    self._listener.start()
+
+    def flush(self):
+        """Write everything queued so far and wait for it"""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+        self.target.flush()
+
+    def close(self):
+        self.flush()
+        self.target.close()
+        super().close()
+
+
+_handlers = weakref.WeakSet()
+
+
+def flush():
+    """Write out the records queued by every QueueHandler (used at exit and in tests)"""
+    for handler in list(_handlers):
+        handler.flush()
+
+
+def _reset_after_fork():
+    # The writer thread doesn't survive the fork, and the parent writes what it had queued
+    for handler in _handlers:
+        handler._lock = threading.Lock()
+        handler._listener = None
+        handler.queue = queue.Queue(handler.queue.maxsize)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,25 @@
+"""
+Dedicated job dispatcher
+Forwards queued workflow jobs and due retries without waiting for a web process to start its workers
+"""
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Forward queued workflow jobs and retry failed at-least-once deliveries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now, then exit')
+
+    def handle(self, *args, **options):
+        queue = jobs.get_job_queue()
+        if options['once']:
+            queue.drain()
+            return
+        self.stdout.write(f"Processing jobs from {type(queue.store).__name__}, press CTRL-C to stop")
+        try:
+            queue.run_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,377 @@
+"""
+Prometheus-style metrics for the n8n proxy
+Counters, gauges and histograms recorded into per-thread shards and merged across worker processes
+"""
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+DESCRIPTIONS = {
+    "n8n_proxy_requests_total": (COUNTER, "Workflow trigger responses by slug and HTTP status"),
+    "n8n_proxy_stage_seconds": (
+        HISTOGRAM, "Time spent per trigger stage (validate, build_payload, upstream, serialize)"
+    ),
+    "n8n_proxy_in_flight": (GAUGE, "Workflow triggers currently being handled"),
+    "n8n_proxy_upstream_timeouts_total": (COUNTER, "n8n calls that timed out"),
+    "n8n_proxy_upstream_errors_total": (COUNTER, "n8n calls that failed with a network error"),
+    "n8n_proxy_rate_limited_total": (COUNTER, "Workflow triggers rejected by a rate limit, by slug and scope"),
+    "n8n_proxy_payloads_rejected_total": (
+        COUNTER, "Workflow triggers refused for their body size (too_large) or schema (invalid), by slug"
+    ),
+    "n8n_proxy_admission_wait_seconds": (
+        HISTOGRAM, "Time workflow triggers waited for an admission slot, by slug and priority (interactive, bulk)"
+    ),
+    "n8n_proxy_admission_waiting": (GAUGE, "Workflow triggers waiting for an admission slot, by priority"),
+    "n8n_proxy_shed_total": (
+        COUNTER, "Workflow triggers refused with 503 by admission control, by slug and reason "
+        "(queue_full, deadline, timeout)"
+    ),
+    "n8n_proxy_log_records_dropped_total": (COUNTER, "Log records dropped because the log writer had fallen behind"),
+    "n8n_upstream_in_flight": (GAUGE, "Calls under way per n8n instance of load-balanced slugs"),
+    "n8n_upstream_ejected": (GAUGE, "Whether an n8n instance is ejected from its slug's pool after failing"),
+    "n8n_upstream_ejections_total": (COUNTER, "Times an n8n instance was ejected from its slug's pool"),
+    "n8n_upstream_retries_total": (COUNTER, "Triggers sent to another n8n instance after a connect failure"),
+    "n8n_proxy_deliveries_queued_total": (COUNTER, "At-least-once triggers queued for retry after a failed delivery"),
+    "n8n_job_runs_total": (
+        COUNTER, "Job attempts by slug and outcome (succeeded, failed, retried, dead_lettered, awaiting_callback)"
+    ),
+    "n8n_job_callbacks_total": (COUNTER, "Results n8n called back with, by slug and outcome (succeeded, failed)"),
+    "n8n_proxy_trace_spans_dropped_total": (COUNTER, "Trace spans lost to a full export queue or a failed export"),
+}
+
+
+class _Shard:
+    """Metric values written by a single thread"""
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def merge_into(self, other):
+        for key, value in self.counters.items():
+            other.counters[key] = other.counters.get(key, 0) + value
+        for key, value in self.gauges.items():
+            other.gauges[key] = other.gauges.get(key, 0) + value
+        for key, histogram in self.histograms.items():
+            _merge_histogram(other.histograms, key, list(histogram))
+
+
+class Registry:
+    """
+    Collects metrics without a lock on the hot path
+
+    Every thread writes only to its own shard, so recording is a couple of
+    dict operations. Scrapes merge all shards, plus snapshots that other
+    worker processes have written to METRICS_DIR.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # Values of threads that have exited, so short-lived threads don't pile up shards
+        self._retired = _Shard()
+        self._collectors = []
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._shards_lock:
+                self._retire_dead_shards()
+                self._shards.append(shard)
+            # A forked worker starts without shards or a flusher; its first
+            # record brings the flusher back
+            start_flusher()
+        return shard
+
+    def _retire_dead_shards(self):
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                shard.merge_into(self._retired)
+        self._shards = alive
+
+    def inc(self, name, labels=(), value=1):
+        """Increase a counter"""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def gauge_add(self, name, labels=(), value=1):
+        """Move a gauge up (or down, with a negative value)"""
+        gauges = self._shard().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0) + value
+
+    def observe(self, name, labels=(), value=0.0):
+        """Record a value in a latency histogram"""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # Bucket counts (last one is +Inf), then sum, then count
+            histogram = histograms[key] = [0] * (len(LATENCY_BUCKETS) + 3)
+        histogram[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def register_collector(self, collector):
+        """
+        Add a callable sampled on every snapshot
+
+        The callable returns an iterable of (type, name, labels, value) tuples,
+        where type is COUNTER or GAUGE.
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        """
+        Merge every thread's shard and the registered collectors
+
+        Returns:
+            dict: {"counters": {...}, "gauges": {...}, "histograms": {...}} keyed by (name, labels)
+        """
+        merged = {"counters": {}, "gauges": {}, "histograms": {}}
+        with self._shards_lock:
+            self._retire_dead_shards()
+            shards = [self._retired] + self._shards
+
+        for shard in shards:
+            # dict() copies in one step under the GIL, so concurrent writers are safe
+            for key, value in dict(shard.counters).items():
+                merged["counters"][key] = merged["counters"].get(key, 0) + value
+            for key, value in dict(shard.gauges).items():
+                merged["gauges"][key] = merged["gauges"].get(key, 0) + value
+            for key, histogram in dict(shard.histograms).items():
+                _merge_histogram(merged["histograms"], key, list(histogram))
+
+        for collector in self._collectors:
+            try:
+                for kind, name, labels, value in collector():
+                    bucket = merged["counters"] if kind == COUNTER else merged["gauges"]
+                    bucket[(name, labels)] = bucket.get((name, labels), 0) + value
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return merged
+
+    def reset(self):
+        """Drop every recorded value (used in tests)"""
+        with self._shards_lock:
+            for shard in [self._retired] + self._shards:
+                shard.counters.clear()
+                shard.gauges.clear()
+                shard.histograms.clear()
+
+
+def _merge_histogram(target, key, histogram):
+    existing = target.get(key)
+    if existing is None:
+        target[key] = histogram
+    else:
+        target[key] = [a + b for a, b in zip(existing, histogram)]
+
+
+registry = Registry()
+
+
+@contextmanager
+def timed(name, labels=()):
+    """Observe the elapsed time of a block into a histogram"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, labels, time.perf_counter() - started)
+
+
+# Cross-process aggregation ---------------------------------------------------
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _encode(snapshot):
+    return {
+        kind: [[name, [list(label) for label in labels], value] for (name, labels), value in values.items()]
+        for kind, values in snapshot.items()
+    }
+
+
+def _decode(data):
+    return {
+        kind: {(name, tuple(tuple(label) for label in labels)): value for name, labels, value in entries}
+        for kind, entries in data.items()
+    }
+
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR so other workers can serve it"""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    payload = json.dumps(_encode(registry.snapshot()))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as tmp:
+        tmp.write(payload)
+    os.replace(tmp_path, os.path.join(directory, f"{os.getpid()}.json"))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    Return metrics aggregated over every worker process
+
+    Counters and histograms of exited workers are kept so totals never go
+    backwards; their gauges are dropped.
+    """
+    merged = registry.snapshot()
+    directory = _metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return merged
+
+    own_pid = os.getpid()
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            pid = int(filename[:-5])
+        except ValueError:
+            continue
+        if pid == own_pid:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as snapshot_file:
+                other = _decode(json.load(snapshot_file))
+        except (OSError, ValueError):
+            continue
+
+        for key, value in other.get("counters", {}).items():
+            merged["counters"][key] = merged["counters"].get(key, 0) + value
+        for key, histogram in other.get("histograms", {}).items():
+            _merge_histogram(merged["histograms"], key, histogram)
+        if _pid_alive(pid):
+            for key, value in other.get("gauges", {}).items():
+                merged["gauges"][key] = merged["gauges"].get(key, 0) + value
+    return merged
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher():
+    """Start the background thread that periodically flushes this process's snapshot"""
+    global _flusher
+    if not _metrics_dir() or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        flush()
+                    except OSError:
+                        logger.exception("Failed to flush metrics snapshot")
+
+            _flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+            _flusher.start()
+
+
+def _reset_after_fork():
+    global _flusher, _flusher_lock
+    _flusher = None
+    _flusher_lock = threading.Lock()
+    registry._shards_lock = threading.Lock()
+    registry._shards = []
+    registry._retired = _Shard()
+    registry._local = threading.local()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# Prometheus text exposition --------------------------------------------------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render(snapshot):
+    """
+    Render a snapshot in the Prometheus text exposition format (version 0.0.4)
+
+    Returns:
+        str: Exposition text
+    """
+    families = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for (name, labels), value in snapshot[kind].items():
+            families.setdefault(name, (kind, []))[1].append((labels, value))
+
+    lines = []
+    for name in sorted(families):
+        kind, samples = families[name]
+        metric_type, description = DESCRIPTIONS.get(name, ({
+            "counters": COUNTER, "gauges": GAUGE, "histograms": HISTOGRAM
+        }[kind], name))
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(samples, key=lambda sample: sample[0]):
+            if kind != "histograms":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), value[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
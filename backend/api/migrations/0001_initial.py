@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-18 11:50
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistryVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Workflow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('url', models.CharField(help_text='n8n webhook URL', max_length=500, validators=[api.models.validate_webhook_url])),
+                ('enabled', models.BooleanField(default=True)),
+                ('connect_timeout', models.FloatField(blank=True, help_text='Seconds; empty uses N8N_TIMEOUT', null=True)),
+                ('read_timeout', models.FloatField(blank=True, help_text='Seconds; empty uses N8N_TIMEOUT', null=True)),
+                ('cache_ttl', models.PositiveIntegerField(blank=True, help_text='Seconds to cache successful results; empty disables caching', null=True)),
+                ('cache_max_entries', models.PositiveIntegerField(default=256)),
+                ('cache_vary_on_user', models.BooleanField(default=False)),
+                ('auth_required', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['slug'],
+            },
+        ),
+    ]
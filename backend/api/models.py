@@ -0,0 +1,65 @@
+"""
+Database models for the API
+The workflow registry lets n8n webhooks be added or changed without a redeploy
+"""
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ValidationError
+from django.db import models
+
+
+def validate_webhook_url(value):
+    """
+    Accept any http(s) URL with a host
+
+    Unlike URLValidator, hosts without a dot (e.g. http://n8n:5678 on a
+    Docker network) are fine.
+    """
+    try:
+        parts = urlsplit(value)
+        parts.port
+    except ValueError:
+        raise ValidationError("Enter a valid URL.", code="invalid")
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValidationError("Enter an http or https URL with a host.", code="invalid")
+
+
+class Workflow(models.Model):
+    """
+    An n8n workflow that can be triggered through the proxy
+
+    Rows take precedence over settings.N8N_WEBHOOKS entries with the same slug;
+    a disabled row hides the slug entirely.
+    """
+    slug = models.SlugField(max_length=100, unique=True)
+    url = models.CharField(max_length=500, validators=[validate_webhook_url], help_text="n8n webhook URL")
+    enabled = models.BooleanField(default=True)
+    connect_timeout = models.FloatField(
+        null=True, blank=True, help_text="Seconds; empty uses N8N_TIMEOUT"
+    )
+    read_timeout = models.FloatField(
+        null=True, blank=True, help_text="Seconds; empty uses N8N_TIMEOUT"
+    )
+    cache_ttl = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Seconds to cache successful results; empty disables caching"
+    )
+    cache_max_entries = models.PositiveIntegerField(default=256)
+    cache_vary_on_user = models.BooleanField(default=False)
+    auth_required = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["slug"]
+
+    def __str__(self):
+        return self.slug
+
+
+class RegistryVersion(models.Model):
+    """
+    Single-row counter bumped on every registry change
+
+    Worker processes compare it with the version their in-memory index was
+    built from, instead of reloading every workflow on each request.
+    """
+    version = models.PositiveBigIntegerField(default=0)
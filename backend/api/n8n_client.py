@@ -0,0 +1,224 @@
+"""
+Outbound HTTP client for n8n webhooks
+Keeps one pooled, keep-alive requests.Session per n8n host and exposes pool stats,
+plus a non-blocking httpx.AsyncClient per host for the ASGI trigger path
+"""
+import asyncio
+import http.cookiejar
+import os
+import socket
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_session_hits = 0
+
+# httpx.AsyncClient instances are bound to the event loop that created them
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _pool_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _host_key(url):
+    """Return the scheme://host[:port] part of a webhook URL"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _keepalive_socket_options():
+    """
+    Build socket options enabling TCP keep-alive on pooled connections
+
+    Returns:
+        list: Socket options for urllib3 connections
+    """
+    options = list(HTTPConnection.default_socket_options)
+    if not _pool_setting('N8N_TCP_KEEPALIVE', True):
+        return options
+
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    idle = _pool_setting('N8N_TCP_KEEPALIVE_IDLE', 60)
+    interval = _pool_setting('N8N_TCP_KEEPALIVE_INTERVAL', 10)
+    # TCP_KEEPIDLE/TCP_KEEPINTVL are not available on every platform
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval))
+    return options
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections use TCP keep-alive"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault('socket_options', _keepalive_socket_options())
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _create_session():
+    adapter = KeepAliveAdapter(
+        pool_connections=_pool_setting('N8N_POOL_CONNECTIONS', 10),
+        pool_maxsize=_pool_setting('N8N_POOL_MAXSIZE', 20),
+        pool_block=_pool_setting('N8N_POOL_BLOCK', False),
+        max_retries=0,
+    )
+    session = requests.Session()
+    # The session is shared by every caller, so cookies set by n8n must not be replayed on later triggers
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(url):
+    """
+    Return the shared session for the host of the given webhook URL
+
+    Sessions are created lazily, once per host and process, and are safe to
+    share between worker threads since urllib3's connection pools are
+    thread-safe.
+
+    Args:
+        url: n8n webhook URL
+
+    Returns:
+        requests.Session: Pooled session for the URL's host
+    """
+    global _session_hits
+    key = _host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _create_session()
+            _sessions[key] = session
+        else:
+            _session_hits += 1
+    return session
+
+
+def post(url, **kwargs):
+    """
+    POST to an n8n webhook through the pooled session for its host
+
+    Accepts the same keyword arguments as requests.post.
+    """
+    return get_session(url).post(url, **kwargs)
+
+
+def get(url, **kwargs):
+    """
+    GET a URL on an n8n host through the pooled session for that host
+
+    Accepts the same keyword arguments as requests.get.
+    """
+    return get_session(url).get(url, **kwargs)
+
+
+def _create_async_client():
+    # httpx and the httpcore/anyio stack behind it add ~150ms to a cold start and
+    # only the ASGI trigger path needs them, so they are imported on first use
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=_pool_setting('N8N_ASYNC_MAX_CONNECTIONS', 1000),
+        max_keepalive_connections=_pool_setting('N8N_POOL_MAXSIZE', 20),
+        keepalive_expiry=_pool_setting('N8N_POOL_KEEPALIVE_EXPIRY', 4),
+    )
+    return httpx.AsyncClient(limits=limits, follow_redirects=False)
+
+
+def get_async_client(url):
+    """
+    Return the shared async client for the host of the given webhook URL
+
+    Clients are kept per event loop, so they are only shared between
+    coroutines that can safely use the same connections.
+
+    Args:
+        url: n8n webhook URL
+
+    Returns:
+        httpx.AsyncClient: Pooled non-blocking client for the URL's host
+    """
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = _host_key(url)
+    client = loop_clients.get(key)
+    if client is None:
+        client = loop_clients[key] = _create_async_client()
+    return client
+
+
+async def apost(url, **kwargs):
+    """
+    POST to an n8n webhook without blocking the event loop
+
+    Accepts the same keyword arguments as httpx.AsyncClient.post.
+    """
+    return await get_async_client(url).post(url, **kwargs)
+
+
+def pool_stats():
+    """
+    Collect connection pool statistics for every n8n host
+
+    Returns:
+        dict: Session hits plus per-host new connection, request and reuse counts
+    """
+    hosts = {}
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+
+    for host, session in sessions:
+        adapter = session.get_adapter(host + '/')
+        connections = requests_count = 0
+        manager = adapter.poolmanager
+        for pool_key in manager.pools.keys():
+            pool = manager.pools.get(pool_key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            requests_count += pool.num_requests
+        hosts[host] = {
+            "new_connections": connections,
+            "requests": requests_count,
+            "reuses": max(requests_count - connections, 0),
+        }
+
+    return {
+        "session_hits": _session_hits,
+        "sessions": len(hosts),
+        "async_clients": sum(len(clients) for clients in list(_async_clients.values())),
+        "hosts": hosts,
+    }
+
+
+def reset_sessions():
+    """Close and forget every pooled session (used after fork and in tests)"""
+    global _session_hits
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _session_hits = 0
+
+
+def _reset_after_fork():
+    # Sockets inherited from a preloading parent must not be shared by workers
+    global _sessions_lock
+    _sessions_lock = threading.Lock()
+    _sessions.clear()
+    _async_clients.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
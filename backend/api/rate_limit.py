@@ -0,0 +1,224 @@
+"""
+Token-bucket rate limits for workflow triggers
+Per-user (or per-IP) and per-slug buckets kept in a pluggable store
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from rest_framework.throttling import BaseThrottle
+
+USER = "USER"
+SLUG = "SLUG"
+
+
+class BucketStore:
+    """
+    Interface for rate limit backends
+
+    Buckets are stored GCRA-style as a single "theoretical arrival time": the
+    moment the bucket would be full again. That's equivalent to tracking
+    tokens and a refill timestamp, but needs one number per key.
+    """
+
+    def consume(self, key, rate, burst, cost=1):
+        """
+        Take `cost` tokens from a bucket refilled at `rate` tokens per second, holding at most `burst`
+
+        A negative cost gives tokens back, and always succeeds.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise seconds until they will be available
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+def _gcra(tat, now, rate, burst, cost):
+    """Return (new arrival time, seconds to wait) for one consume attempt"""
+    interval = 1.0 / rate
+    new_tat = max(tat, now) + cost * interval
+    wait = new_tat - now - burst * interval
+    if wait > 0:
+        return tat, wait
+    return new_tat, 0.0
+
+
+class InMemoryBucketStore(BucketStore):
+    """
+    Process-local store; each worker process enforces its own limits
+
+    Args:
+        max_keys: Buckets kept before full (idle) ones are swept out
+    """
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tat, wait = _gcra(self._tats.get(key, now), now, rate, burst, cost)
+            if wait:
+                return wait
+            self._tats[key] = tat
+            if len(self._tats) > self.max_keys:
+                # A bucket whose arrival time has passed is full, the same as a missing one
+                self._tats = {k: v for k, v in self._tats.items() if v > now}
+        return 0.0
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class SQLiteBucketStore(BucketStore):
+    """
+    SQLite-backed store shared by every worker process on the host
+
+    Each consume runs in an IMMEDIATE transaction. Durability isn't needed
+    for rate limits, so the database skips fsync.
+    """
+
+    def __init__(self, path=None):
+        self.path = str(path or settings.BASE_DIR / 'ratelimit.sqlite3')
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key, rate, burst, cost=1):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tat, wait = _gcra(row[0] if row else now, now, rate, burst, cost)
+            if not wait:
+                conn.execute("INSERT OR REPLACE INTO rate_buckets (key, tat) VALUES (?, ?)", (key, tat))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def clear(self):
+        self._connection().execute("DELETE FROM rate_buckets")
+
+
+class RateLimited(Exception):
+    """Raised when a trigger exceeds one of its token buckets"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Rate limit exceeded ({scope.lower()})")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def limits_for(slug):
+    """
+    Return the {"USER": {...}, "SLUG": {...}} limits for a workflow slug
+
+    Defaults come from settings.N8N_RATE_LIMIT, overridden per slug by
+    settings.N8N_RATE_LIMITS[slug]; a slug mapped to None is not limited, and
+    a limit with a RATE of 0 is off.
+    """
+    overrides = getattr(settings, 'N8N_RATE_LIMITS', {})
+    if slug in overrides and overrides[slug] is None:
+        return {}
+    limits = {**getattr(settings, 'N8N_RATE_LIMIT', {}), **(overrides.get(slug) or {})}
+    return {scope: limit for scope, limit in limits.items() if limit and limit.get("RATE")}
+
+
+_ident = BaseThrottle()
+
+
+def client_key(request, user):
+    """Identify the caller: the user id, or the client IP (honouring DRF's NUM_PROXIES) when anonymous"""
+    if user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{_ident.get_ident(request)}"
+
+
+def check(slug, client, cost=1):
+    """
+    Take tokens for one trigger (or `cost` triggers) of a slug by a client
+
+    Tokens taken from the client's bucket are given back when the slug's
+    bucket turns the trigger down, so rejected triggers don't use up the quota.
+
+    Raises:
+        RateLimited: If the client's or the slug's bucket is empty
+    """
+    limits = limits_for(slug)
+    if not limits:
+        return
+    store = get_store()
+    taken = []
+    for scope, key in ((USER, f"rl:{slug}:{client}"), (SLUG, f"rl:{slug}")):
+        limit = limits.get(scope)
+        if limit is None:
+            continue
+        wait = store.consume(key, limit["RATE"], limit.get("BURST", 1), cost)
+        if wait:
+            for taken_key, taken_limit in taken:
+                store.consume(taken_key, taken_limit["RATE"], taken_limit.get("BURST", 1), -cost)
+            raise RateLimited(scope, wait)
+        taken.append((key, limit))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide bucket store, building it from settings on first use"""
+    global _store
+    config = (
+        getattr(settings, 'N8N_RATE_LIMIT_STORE', 'api.rate_limit.InMemoryBucketStore'),
+        getattr(settings, 'N8N_RATE_LIMIT_STORE_OPTIONS', {}),
+    )
+    cached = _store
+    if cached is not None and cached[0] == config:
+        return cached[1]
+    with _store_lock:
+        if _store is None or _store[0] != config:
+            _store = (config, import_string(config[0])(**config[1]))
+        return _store[1]
+
+
+def reset_store():
+    """Empty every bucket and forget the store (used in tests)"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store[1].clear()
+        _store = None
+
+
+def _reset_after_fork():
+    global _store, _store_lock
+    _store_lock = threading.Lock()
+    # SQLite connections must not be shared with the parent
+    _store = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,189 @@
+"""
+Workflow registry
+Resolves slugs from an in-memory index built from settings.N8N_WEBHOOKS and the Workflow table
+"""
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import RegistryVersion, Workflow
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_urls(value):
+    """The URLs of an N8N_WEBHOOKS value, which is one URL or a list of them"""
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+class WorkflowEntry:
+    """
+    Resolved configuration of one workflow slug
+
+    Entries from settings leave timeouts and cache policy as None, so the
+    N8N_TIMEOUTS and N8N_WORKFLOW_CACHE settings keep applying to them.
+    `url` is the first of `urls`; slugs with several are load balanced
+    (see api.load_balancer).
+    """
+    __slots__ = ("slug", "url", "urls", "connect_timeout", "read_timeout", "cache", "auth_required")
+
+    def __init__(self, slug, url, connect_timeout=None, read_timeout=None, cache=None, auth_required=False):
+        self.slug = slug
+        self.urls = webhook_urls(url)
+        self.url = self.urls[0]
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.cache = cache
+        self.auth_required = auth_required
+
+    @classmethod
+    def from_model(cls, workflow):
+        cache = {}
+        if workflow.cache_ttl:
+            cache = {
+                "TTL": workflow.cache_ttl,
+                "MAX_ENTRIES": workflow.cache_max_entries,
+                "VARY_ON_USER": workflow.cache_vary_on_user,
+            }
+        return cls(
+            workflow.slug,
+            workflow.url,
+            connect_timeout=workflow.connect_timeout,
+            read_timeout=workflow.read_timeout,
+            cache=cache,
+            auth_required=workflow.auth_required,
+        )
+
+
+class WorkflowRegistry:
+    """
+    Process-local slug index, reloaded when the registry version changes
+
+    Lookups are a dict access. At most once every N8N_REGISTRY_REFRESH_SECONDS
+    a lookup reads the RegistryVersion counter and, only if it moved, reloads
+    the Workflow table. Changes made in this process apply immediately.
+    """
+
+    def __init__(self):
+        self._index = {}
+        self._rows = {}
+        self._version = None
+        self._source = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get(self, slug, refresh=True):
+        """
+        Return the WorkflowEntry for a slug
+
+        Args:
+            slug: Workflow identifier
+            refresh: Whether this call may query the database for a newer
+                registry version; pass False off the request thread
+
+        Returns:
+            WorkflowEntry: Entry for the slug, or None if it's unknown or disabled
+        """
+        if refresh and self.needs_reload():
+            self.reload()
+        elif getattr(settings, 'N8N_WEBHOOKS', {}) is not self._source:
+            with self._lock:
+                self._rebuild()
+        return self._index.get(slug)
+
+    async def aget(self, slug):
+        """Async variant of get() that only leaves the event loop to reload"""
+        if self.needs_reload():
+            await sync_to_async(self.reload)()
+        return self.get(slug, refresh=False)
+
+    def needs_reload(self):
+        if self._checked_at is None:
+            return True
+        return time.monotonic() - self._checked_at >= getattr(settings, 'N8N_REGISTRY_REFRESH_SECONDS', 5)
+
+    def reload(self):
+        """Reload the Workflow table if the registry version changed"""
+        with self._lock:
+            if self.needs_reload():
+                self._load()
+            if getattr(settings, 'N8N_WEBHOOKS', {}) is not self._source:
+                self._rebuild()
+
+    def _load(self):
+        try:
+            version = RegistryVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+            if version != self._version:
+                self._rows = {
+                    workflow.slug: WorkflowEntry.from_model(workflow) if workflow.enabled else None
+                    for workflow in Workflow.objects.all()
+                }
+                self._version = version
+                self._source = None
+        except DatabaseError:
+            # Table missing or database down: keep serving the last known index
+            logger.exception("Failed to load the workflow registry")
+        self._checked_at = time.monotonic()
+
+    def _rebuild(self):
+        source = getattr(settings, 'N8N_WEBHOOKS', {})
+        index = {slug: WorkflowEntry(slug, url) for slug, url in source.items()}
+        index.update(self._rows)
+        self._index = {slug: entry for slug, entry in index.items() if entry is not None}
+        self._source = source
+
+    def invalidate(self):
+        """Make the next lookup reload the Workflow table"""
+        self._version = None
+        self._checked_at = None
+
+    @property
+    def version(self):
+        return self._version
+
+    def reset(self):
+        """Forget the index and loaded rows (used in tests)"""
+        with self._lock:
+            self._index = {}
+            self._rows = {}
+            self._version = None
+            self._source = None
+            self._checked_at = None
+
+
+workflows = WorkflowRegistry()
+
+
+def bump_version():
+    """
+    Record a registry change so every worker reloads its index
+
+    Saving or deleting a Workflow calls this through signals; call it
+    yourself after bulk operations such as QuerySet.update().
+    """
+    if not RegistryVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        RegistryVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+    workflows.invalidate()
+    transaction.on_commit(workflows.invalidate)
+
+
+@receiver(post_save, sender=Workflow)
+@receiver(post_delete, sender=Workflow)
+def _workflow_changed(sender, **kwargs):
+    bump_version()
+
+
+def _reset_after_fork():
+    workflows._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,191 @@
+"""
+Response cache for idempotent n8n workflows
+Caches successful results per slug, keyed by a canonical hash of the payload
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import registry
+
+HIT = "HIT"
+MISS = "MISS"
+
+
+def canonical_hash(value):
+    """Return a stable SHA-256 hex digest of a JSON-serialisable value"""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with per-entry expiry and LRU eviction
+
+    Args:
+        max_entries: Entries kept before the least recently used one is evicted
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCache:
+    """
+    Adapter storing entries in one of Django's configured caches
+
+    Use this when several worker processes should share cached results;
+    eviction is then governed by that cache's own MAX_ENTRIES option.
+    """
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def get(self, key):
+        return caches[self.alias].get(key)
+
+    def set(self, key, value, ttl):
+        caches[self.alias].set(key, value, ttl)
+
+    def delete(self, key):
+        caches[self.alias].delete(key)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+class WorkflowCache:
+    """
+    Cache policy for a single workflow slug
+
+    Args:
+        slug: Workflow identifier
+        ttl: Seconds a result stays fresh
+        backend: LRUCache or DjangoCache holding the entries
+        vary_on_user: Whether the requesting user is part of the key
+    """
+
+    def __init__(self, slug, ttl, backend, vary_on_user=False):
+        self.slug = slug
+        self.ttl = ttl
+        self.backend = backend
+        self.vary_on_user = vary_on_user
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, payload, user):
+        parts = {"slug": self.slug, "payload": payload}
+        if self.vary_on_user:
+            parts["user"] = user.id if user.is_authenticated else None
+        return f"n8n-workflow:{self.slug}:{canonical_hash(parts)}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def for_slug(slug):
+    """
+    Return the WorkflowCache configured for a slug
+
+    Configuration comes from settings.N8N_WORKFLOW_CACHE, e.g.
+    {"n8n-healthcheck": {"TTL": 30, "MAX_ENTRIES": 256, "VARY_ON_USER": False}}.
+    Setting "BACKEND" to a Django cache alias shares entries between processes.
+    Slugs defined in the Workflow registry use the cache policy of their row.
+    Workflows requiring authentication always vary on the user, so one
+    caller's answer is never served to another.
+
+    Returns:
+        WorkflowCache: Cache for the slug, or None when the slug isn't cacheable
+    """
+    entry = registry.workflows.get(slug, refresh=False)
+    if entry is not None and entry.cache is not None:
+        config = entry.cache
+    else:
+        config = getattr(settings, 'N8N_WORKFLOW_CACHE', {}).get(slug)
+    if not config:
+        return None
+    if entry is not None and entry.auth_required and not config.get("VARY_ON_USER"):
+        config = {**config, "VARY_ON_USER": True}
+
+    cached = _caches.get(slug)
+    if cached is not None and cached[0] == config:
+        return cached[1]
+
+    with _caches_lock:
+        cached = _caches.get(slug)
+        if cached is None or cached[0] != config:
+            alias = config.get("BACKEND")
+            backend = DjangoCache(alias) if alias else LRUCache(config.get("MAX_ENTRIES", 256))
+            workflow_cache = WorkflowCache(
+                slug,
+                ttl=config.get("TTL", 60),
+                backend=backend,
+                vary_on_user=config.get("VARY_ON_USER", False),
+            )
+            cached = _caches[slug] = (dict(config), workflow_cache)
+    return cached[1]
+
+
+def cache_stats():
+    """Return hit/miss counters for every cache built so far"""
+    return {
+        slug: {"hits": workflow_cache.hits, "misses": workflow_cache.misses}
+        for slug, (_, workflow_cache) in list(_caches.items())
+    }
+
+
+def reset_caches():
+    """Drop every cache and its entries (used in tests)"""
+    with _caches_lock:
+        for _, workflow_cache in _caches.values():
+            workflow_cache.backend.clear()
+        _caches.clear()
@@ -0,0 +1,84 @@
+"""
+Request coalescing for identical concurrent workflow triggers
+Lets one upstream call answer every in-flight request that shares its key
+"""
+import threading
+
+
+class _Call:
+    """An upstream call that followers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for it and receive the same result
+    or exception. Nothing is remembered once the call finishes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Run fn once for all concurrent callers sharing key
+
+        Args:
+            key: Hashable identity of the call
+            fn: Zero-argument callable performing the upstream call
+
+        Returns:
+            tuple: (result, shared) where shared is True for callers that
+            received another caller's result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """Return the number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight(),
+        }
+
+
+workflow_calls = SingleFlight()
@@ -0,0 +1,425 @@
+"""
+Request tracing for the n8n proxy
+Propagates W3C trace context to n8n and records sampled spans, exported as OTLP/JSON off the request path
+"""
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import fast_json, metrics
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_span = ContextVar("trace_span", default=None)
+
+
+class Trace:
+    """The spans of one request; `recording` is False for requests that weren't sampled"""
+
+    __slots__ = ("trace_id", "sampled", "recording", "spans")
+
+    def __init__(self, trace_id, sampled, recording):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.recording = recording
+        self.spans = []
+
+
+class Span:
+    """A timed stage of a request"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "status")
+
+    def __init__(self, trace, name, parent_id=None, kind=INTERNAL, attributes=None):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = None
+
+    def end(self, error=None):
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = STATUS_ERROR
+            self.attributes["exception.type"] = type(error).__name__
+        if self.trace.recording:
+            self.trace.spans.append(self)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status is not None:
+            span["status"] = {"code": self.status}
+        return span
+
+
+def _new_id(bits):
+    # All-zero ids are invalid in trace context
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def parse_traceparent(value):
+    """
+    Parse a W3C traceparent header
+
+    Returns:
+        tuple: (trace id, parent span id, sampled), or None if the header is missing or invalid
+    """
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def start_trace(traceparent=None, name="request", attributes=None):
+    """
+    Open the root span of a request and make it current
+
+    The trace id and sampling decision come from an incoming traceparent;
+    without one a new trace is started and sampled at settings.TRACING_SAMPLE_RATE.
+    Spans are only recorded for sampled traces and when an exporter is configured.
+
+    Returns:
+        Span: The root span, to be passed to finish_trace()
+    """
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = _new_id(128), None
+        sampled = random.random() < getattr(settings, 'TRACING_SAMPLE_RATE', 0.0)
+    recording = sampled and bool(getattr(settings, 'TRACING_EXPORTER', None))
+    root = Span(Trace(trace_id, sampled, recording), name, parent_id, SERVER, attributes)
+    _span.set(root)
+    return root
+
+
+def finish_trace(root, error=None):
+    """End the root span and hand a recorded trace to the exporter"""
+    root.end(error)
+    _span.set(None)
+    if root.trace.recording:
+        get_exporter().submit(root.trace.spans)
+
+
+class _NoSpan:
+    """Context manager used when a request isn't recorded, shared so nothing is allocated"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _ChildSpan:
+    def __init__(self, parent, name, kind, attributes):
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.span = Span(self.parent.trace, self.name, self.parent.span_id, self.kind, self.attributes)
+        self.token = _span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        _span.reset(self.token)
+        self.span.end(exc)
+        return False
+
+
+def span(name, kind=INTERNAL, **attributes):
+    """
+    Time a block as a child of the current span
+
+    Used as a context manager; it yields the span, or None when the request
+    isn't being recorded, in which case nothing is timed.
+    """
+    parent = _span.get()
+    if parent is None or not parent.trace.recording:
+        return _NO_SPAN
+    return _ChildSpan(parent, name, kind, attributes)
+
+
+def set_attribute(key, value):
+    """Attach an attribute to the current span, if the request is being recorded"""
+    current = _span.get()
+    if current is not None and current.trace.recording:
+        current.attributes[key] = value
+
+
+def current_trace_id():
+    """Trace id of the current request, or None outside of one"""
+    current = _span.get()
+    return current.trace.trace_id if current is not None else None
+
+
+def outbound_headers():
+    """traceparent header continuing the current trace on an outbound call ({} outside of a request)"""
+    current = _span.get()
+    if current is None:
+        return {}
+    flags = "01" if current.trace.sampled else "00"
+    return {TRACEPARENT: f"00-{current.trace.trace_id}-{current.span_id}-{flags}"}
+
+
+class TracingMiddleware:
+    """
+    Starts a trace for every request and returns its id in an X-Trace-Id header
+
+    Placed right after HealthCheckMiddleware, so the root span covers the rest
+    of the middleware stack. Health probes are answered before it and are
+    deliberately not traced, so frequent probes stay cheap and out of the traces.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        root = self._start(request)
+        try:
+            response = self.get_response(request)
+        except BaseException as e:
+            finish_trace(root, e)
+            raise
+        return self._finish(root, response)
+
+    async def __acall__(self, request):
+        root = self._start(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException as e:
+            finish_trace(root, e)
+            raise
+        return self._finish(root, response)
+
+    def _start(self, request):
+        return start_trace(
+            request.META.get('HTTP_TRACEPARENT'),
+            f"{request.method} {request.path}",
+            {"http.method": request.method, "http.target": request.path},
+        )
+
+    def _finish(self, root, response):
+        root.attributes["http.status_code"] = response.status_code
+        if response.status_code >= 500:
+            root.status = STATUS_ERROR
+        response["X-Trace-Id"] = root.trace.trace_id
+        finish_trace(root)
+        return response
+
+
+# Export ----------------------------------------------------------------------
+
+def otlp_request(spans):
+    """
+    Wrap spans in an OTLP/JSON ExportTraceServiceRequest
+
+    Returns:
+        dict: Request body accepted by an OpenTelemetry collector's /v1/traces
+    """
+    service_name = getattr(settings, 'TRACING_SERVICE_NAME', "n8n-proxy")
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [span.to_otlp() for span in spans]}],
+        }]
+    }
+
+
+class JSONLinesExporter:
+    """
+    Appends each batch as one OTLP/JSON line to a file
+
+    The format is the one the OpenTelemetry collector's file exporter writes
+    and its otlpjsonfile receiver reads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        line = fast_json.dumps(otlp_request(spans)) + b"\n"
+        with open(self.path, "ab") as output:
+            output.write(line)
+
+
+class OTLPExporter:
+    """POSTs each batch to an OTLP/HTTP endpoint, e.g. http://collector:4318/v1/traces"""
+
+    def __init__(self, endpoint, headers=None, timeout=5):
+        self.endpoint = endpoint
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+
+    def export(self, spans):
+        import requests
+
+        resp = requests.post(
+            self.endpoint, data=fast_json.dumps(otlp_request(spans)), headers=self.headers, timeout=self.timeout
+        )
+        resp.raise_for_status()
+
+
+class BatchExporter:
+    """
+    Hands finished traces to a background thread that exports them in batches
+
+    Requests only put their spans on a bounded queue; when the queue is full
+    the trace is dropped and counted rather than slowing the request down.
+    """
+
+    def __init__(self, exporter, max_queue=2048, batch_size=512, interval=5.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, spans):
+        self._start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            metrics.registry.inc("n8n_proxy_trace_spans_dropped_total", value=len(spans))
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            deadline = time.monotonic() + self.interval
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.extend(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def flush(self):
+        """Export everything queued so far from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._export(batch)
+
+    def _export(self, batch):
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception:
+            logger.exception("Failed to export %s spans", len(batch))
+            metrics.registry.inc("n8n_proxy_trace_spans_dropped_total", value=len(batch))
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Return the process-wide batch exporter, building it from settings on first use"""
+    global _exporter
+    config = (
+        getattr(settings, 'TRACING_EXPORTER', None),
+        getattr(settings, 'TRACING_EXPORTER_OPTIONS', {}),
+    )
+    cached = _exporter
+    if cached is not None and cached[0] == config:
+        return cached[1]
+    with _exporter_lock:
+        if _exporter is None or _exporter[0] != config:
+            _exporter = (config, BatchExporter(
+                import_string(config[0])(**config[1]),
+                max_queue=getattr(settings, 'TRACING_MAX_QUEUE', 2048),
+                interval=getattr(settings, 'TRACING_EXPORT_INTERVAL', 5.0),
+            ))
+        return _exporter[1]
+
+
+def reset_exporter():
+    """Forget the exporter and anything it hasn't exported (used in tests)"""
+    global _exporter
+    with _exporter_lock:
+        _exporter = None
+
+
+def _reset_after_fork():
+    global _exporter, _exporter_lock
+    _exporter_lock = threading.Lock()
+    # The export thread doesn't survive the fork
+    _exporter = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
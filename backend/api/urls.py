@@ -1,8 +1,21 @@
 from django.urls import path
-from .views import TriggerWorkflowView, HealthCheckView, MeView
+from .views import (
+    TriggerWorkflowView, AsyncTriggerWorkflowView, HealthCheckView, LoginView, MeView, N8NPoolStatsView,
+    TriggerBatchWorkflowView, WorkflowCallbackView, WorkflowJobEventsView, WorkflowJobView, WorkflowJobStatsView,
+    MetricsView,
+)
 
 urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health'),
     path('me/', MeView.as_view(), name='me'),
+    path('auth/login/', LoginView.as_view(), name='login'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('workflows/trigger/', TriggerWorkflowView.as_view(), name='trigger-workflow'),
+    path('workflows/trigger-batch/', TriggerBatchWorkflowView.as_view(), name='trigger-workflow-batch'),
+    path('workflows/trigger-async/', AsyncTriggerWorkflowView.as_view(), name='trigger-workflow-async'),
+    path('workflows/job-stats/', WorkflowJobStatsView.as_view(), name='workflow-job-stats'),
+    path('workflows/jobs/<str:job_id>/', WorkflowJobView.as_view(), name='workflow-job'),
+    path('workflows/jobs/<str:job_id>/events/', WorkflowJobEventsView.as_view(), name='workflow-job-events'),
+    path('workflows/callback/<str:token>/', WorkflowCallbackView.as_view(), name='workflow-callback'),
+    path('workflows/pool-stats/', N8NPoolStatsView.as_view(), name='n8n-pool-stats'),
 ]
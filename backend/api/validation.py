@@ -0,0 +1,373 @@
+"""
+Payload size limits and schema validation for workflow triggers
+Compiles each slug's JSON Schema into plain Python checks once, so a trigger pays only for walking its payload
+"""
+import operator
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Schema keywords that only document a schema
+_ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description", "default", "examples"}
+
+# Reported errors per payload; a payload failing in more places than this is cut short
+MAX_ERRORS = 10
+
+
+class PayloadTooLarge(APIException):
+    """Refuses a trigger body over its size limit with 413"""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body too large"
+    default_code = "payload_too_large"
+
+
+class InvalidPayload(Exception):
+    """Raised when a payload doesn't match its slug's schema; `errors` lists what is wrong, by path"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class _TooManyErrors(Exception):
+    pass
+
+
+# Size limits -----------------------------------------------------------------
+
+def max_body_size(slug=None):
+    """Largest trigger body accepted, in bytes: settings.N8N_PAYLOAD_LIMITS for the slug, else N8N_MAX_BODY_SIZE"""
+    default = getattr(settings, 'N8N_MAX_BODY_SIZE', 1024 * 1024)
+    if slug is None:
+        return default
+    return getattr(settings, 'N8N_PAYLOAD_LIMITS', {}).get(slug, default)
+
+
+def largest_body_size():
+    """Largest body any trigger may have: N8N_MAX_BODY_SIZE or the biggest N8N_PAYLOAD_LIMITS entry"""
+    return max([max_body_size(), *getattr(settings, 'N8N_PAYLOAD_LIMITS', {}).values()])
+
+
+def content_length(request):
+    """Size of the request body as announced by its Content-Length (0 when missing or invalid)"""
+    try:
+        return max(int(request.META.get('CONTENT_LENGTH') or 0), 0)
+    except ValueError:
+        return 0
+
+
+def check_body_size(request, slug=None, size=None):
+    """
+    Refuse a request whose body is larger than the slug's limit
+
+    Unless the size of a body already read is passed, only the Content-Length
+    header is looked at, so this can run before a byte of the body is read.
+    Django never reads past Content-Length, and the compression middleware
+    rewrites it to the inflated size. Before the slug is known, the largest
+    limit of any slug applies; the slug's own limit is checked after the lookup.
+
+    Raises:
+        PayloadTooLarge: If the body is over the limit
+    """
+    limit = largest_body_size() if slug is None else max_body_size(slug)
+    if (content_length(request) if size is None else size) > limit:
+        raise PayloadTooLarge()
+
+
+# Schema compilation ----------------------------------------------------------
+
+# Compared with type(value) rather than isinstance(), which also saves telling bools from numbers
+_STRING = frozenset((str,))
+_LIST = frozenset((list,))
+_NUMBER = frozenset((int, float))
+
+_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+    "object": (dict,),
+    "array": (list,),
+}
+
+
+def _is_number(value):
+    return type(value) in _NUMBER
+
+
+def _format_path(path):
+    # Paths are built as nested (parent, key) tuples and only turned into text for errors
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return "payload" + "".join(reversed(parts))
+
+
+def _fail(errors, path, message):
+    errors.append(f"{_format_path(path)}: {message}")
+    if len(errors) >= MAX_ERRORS:
+        raise _TooManyErrors()
+
+
+def _accept(value, path, errors):
+    pass
+
+
+def compile_schema(schema, where="schema"):
+    """
+    Turn a JSON Schema into a validate(value, path, errors) function
+
+    Supports the keywords payloads are usually described with: type, enum,
+    const, properties, required, additionalProperties, items, minItems,
+    maxItems, minLength, maxLength, pattern, minimum, maximum,
+    exclusiveMinimum and exclusiveMaximum. References and combinators
+    ($ref, anyOf, ...) are not supported.
+
+    Raises:
+        ImproperlyConfigured: If the schema uses an unsupported keyword or is malformed
+    """
+    if schema is True or schema == {}:
+        return _accept
+    if not isinstance(schema, dict):
+        raise ImproperlyConfigured(f"{where} must be an object")
+    unknown = set(schema) - _ANNOTATIONS - set(_KEYWORDS) - _OBJECT_KEYWORDS - {"type"}
+    if unknown:
+        raise ImproperlyConfigured(f"{where} uses unsupported keywords: {', '.join(sorted(unknown))}")
+
+    classes, integral, expected = _compile_type(schema.get("type"), where)
+    checks = []
+    if not _OBJECT_KEYWORDS.isdisjoint(schema):
+        # properties, required and additionalProperties are checked in one pass over the object
+        checks.append(_compile_properties(schema, where))
+    for keyword, compile_keyword in _KEYWORDS.items():
+        if keyword in schema:
+            checks.append(compile_keyword(schema, where))
+
+    if classes is None:
+        if len(checks) == 1:
+            return checks[0]
+
+        def validate(value, path, errors):
+            for check in checks:
+                check(value, path, errors)
+
+        return validate
+
+    # Most schema nodes are a bare type or a type plus one keyword, so those skip the loop
+    only_check = checks[0] if len(checks) == 1 else None
+
+    def validate(value, path, errors):
+        if type(value) not in classes:
+            # JSON has one number type, so 1.0 is an integer too
+            if not (integral and type(value) is float and value.is_integer()):
+                _fail(errors, path, f"expected {expected}")
+                return
+        if only_check is not None:
+            only_check(value, path, errors)
+        elif checks:
+            for check in checks:
+                check(value, path, errors)
+
+    return validate
+
+
+def _compile_type(types, where):
+    if types is None:
+        return None, False, None
+    names = [types] if isinstance(types, str) else types
+    if not isinstance(names, list) or not names or any(name not in _TYPES for name in names):
+        raise ImproperlyConfigured(f"{where}.type must be one of {', '.join(_TYPES)} or a list of them")
+    classes = frozenset(cls for name in names for cls in _TYPES[name])
+    return classes, "integer" in names and float not in classes, " or ".join(names)
+
+
+def _equal(value, expected):
+    # Python treats True as 1, JSON doesn't
+    return value == expected and isinstance(value, bool) == isinstance(expected, bool)
+
+
+def _compile_enum(schema, where):
+    options = schema["enum"]
+    if not isinstance(options, list) or not options:
+        raise ImproperlyConfigured(f"{where}.enum must be a non-empty list")
+
+    def check(value, path, errors):
+        if not any(_equal(value, option) for option in options):
+            _fail(errors, path, f"must be one of {options}")
+
+    return check
+
+
+def _compile_const(schema, where):
+    constant = schema["const"]
+
+    def check(value, path, errors):
+        if not _equal(value, constant):
+            _fail(errors, path, f"must be {constant!r}")
+
+    return check
+
+
+def _compile_properties(schema, where):
+    properties = schema.get("properties", {})
+    required = schema.get("required", [])
+    additional = schema.get("additionalProperties", True)
+    if not isinstance(properties, dict) or not isinstance(required, list):
+        raise ImproperlyConfigured(f"{where}.properties must be an object and {where}.required a list")
+
+    validators = {
+        name: compile_schema(subschema, f"{where}.properties.{name}") for name, subschema in properties.items()
+    }
+    if additional is False:
+        extra = False
+    elif additional is True:
+        extra = None
+    else:
+        extra = compile_schema(additional, f"{where}.additionalProperties")
+
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                _fail(errors, path, f"missing required property '{name}'")
+        for name, item in value.items():
+            validate = validators.get(name)
+            if validate is not None:
+                validate(item, (path, name), errors)
+            elif extra is False:
+                _fail(errors, path, f"unexpected property '{name}'")
+            elif extra is not None:
+                extra(item, (path, name), errors)
+
+    return check
+
+
+def _compile_items(schema, where):
+    validate = compile_schema(schema["items"], f"{where}.items")
+
+    def check(value, path, errors):
+        if isinstance(value, list):
+            for index, item in enumerate(value):
+                validate(item, (path, index), errors)
+
+    return check
+
+
+def _bound(keyword, classes, compare, message, measure=None):
+    def compile_keyword(schema, where):
+        limit = schema[keyword]
+        if not _is_number(limit):
+            raise ImproperlyConfigured(f"{where}.{keyword} must be a number")
+
+        if measure is None:
+            def check(value, path, errors):
+                if type(value) in classes and not compare(value, limit):
+                    _fail(errors, path, message.format(limit))
+        else:
+            def check(value, path, errors):
+                if type(value) in classes and not compare(measure(value), limit):
+                    _fail(errors, path, message.format(limit))
+
+        return check
+
+    return compile_keyword
+
+
+def _compile_pattern(schema, where):
+    try:
+        pattern = re.compile(schema["pattern"])
+    except (re.error, TypeError) as e:
+        raise ImproperlyConfigured(f"{where}.pattern is not a valid regular expression: {e}")
+    search = pattern.search
+
+    def check(value, path, errors):
+        if type(value) is str and search(value) is None:
+            _fail(errors, path, f"must match {pattern.pattern!r}")
+
+    return check
+
+
+_OBJECT_KEYWORDS = {"properties", "required", "additionalProperties"}
+
+_KEYWORDS = {
+    "enum": _compile_enum,
+    "const": _compile_const,
+    "items": _compile_items,
+    "minItems": _bound("minItems", _LIST, operator.ge, "must have at least {} items", len),
+    "maxItems": _bound("maxItems", _LIST, operator.le, "must have at most {} items", len),
+    "minLength": _bound("minLength", _STRING, operator.ge, "must be at least {} characters", len),
+    "maxLength": _bound("maxLength", _STRING, operator.le, "must be at most {} characters", len),
+    "pattern": _compile_pattern,
+    "minimum": _bound("minimum", _NUMBER, operator.ge, "must be >= {}"),
+    "maximum": _bound("maximum", _NUMBER, operator.le, "must be <= {}"),
+    "exclusiveMinimum": _bound("exclusiveMinimum", _NUMBER, operator.gt, "must be > {}"),
+    "exclusiveMaximum": _bound("exclusiveMaximum", _NUMBER, operator.lt, "must be < {}"),
+}
+
+
+# Per-slug validators ---------------------------------------------------------
+
+_validators = None
+_validators_lock = threading.Lock()
+
+
+def compile_all():
+    """
+    Compile every schema in settings.N8N_PAYLOAD_SCHEMAS, reusing the last result while the setting is unchanged
+
+    Called at startup so a broken schema stops the process instead of a request.
+
+    Returns:
+        dict: Slug -> validate(value, path, errors)
+
+    Raises:
+        ImproperlyConfigured: If a schema can't be compiled
+    """
+    global _validators
+    schemas = getattr(settings, 'N8N_PAYLOAD_SCHEMAS', {})
+    cached = _validators
+    # Settings are replaced rather than mutated, so identity is enough and costs nothing per request
+    if cached is not None and cached[0] is schemas:
+        return cached[1]
+    with _validators_lock:
+        if _validators is None or _validators[0] is not schemas:
+            _validators = (schemas, {
+                slug: compile_schema(schema, f"N8N_PAYLOAD_SCHEMAS['{slug}']") for slug, schema in schemas.items()
+            })
+        return _validators[1]
+
+
+def validate_payload(slug, payload):
+    """
+    Check a trigger payload against the schema of its slug
+
+    Slugs without a schema accept any payload.
+
+    Raises:
+        InvalidPayload: If the payload doesn't match
+    """
+    validate = compile_all().get(slug)
+    if validate is None:
+        return
+    errors = []
+    try:
+        validate(payload, None, errors)
+    except _TooManyErrors:
+        pass
+    if errors:
+        raise InvalidPayload(errors)
+
+
+def reset_validators():
+    """Forget compiled schemas (used in tests)"""
+    global _validators
+    with _validators_lock:
+        _validators = None
@@ -3,17 +3,35 @@ API Views for the Django backend
 Handles health checks, user info, and n8n workflow triggers
 """
 from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework import status
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework import exceptions, status
 
+import math
 import requests
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from urllib.parse import urlencode
+
+from . import (
+    admission, authentication, callbacks, circuit_breaker, compression, fast_json, jobs, load_balancer, metrics,
+    n8n_client, rate_limit, registry, response_cache, singleflight, tracing, validation,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +40,9 @@ class HealthCheckView(APIView):
     """
     Simple health check endpoint
     Returns 200 OK if the service is running
+
+    Load balancers should poll /api/healthz/ and /api/readyz/ instead, which
+    api.health.HealthCheckMiddleware answers without running the full stack.
     """
     permission_classes = [AllowAny]
 
@@ -47,6 +68,59 @@ class MeView(APIView):
         })
 
 
+class LoginView(APIView):
+    """
+    Exchanges a username (or email) and password for a signed bearer token
+
+    The password hash is checked once here; requests carrying the token are
+    then authenticated without touching the database.
+
+    Expected request body:
+    {
+        "username": "alice",     # Or "email": "alice@example.com"
+        "password": "..."
+    }
+    """
+    permission_classes = [AllowAny]
+    # A stale token or session must not stand in the way of logging in
+    authentication_classes = []
+
+    def post(self, request):
+        """Handle POST requests to log in"""
+        username = request.data.get("username")
+        email = request.data.get("email")
+        password = request.data.get("password")
+
+        if not (username or email) or not password:
+            return Response(
+                {"error": "Missing required fields: 'username' or 'email', and 'password'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not username:
+            username = get_user_model()._default_manager.filter(
+                email__iexact=email
+            ).values_list('username', flat=True).first()
+
+        user = authenticate(request, username=username, password=password) if username else None
+        if user is None:
+            return Response(
+                {"error": "Invalid credentials"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        return Response({
+            "token": authentication.issue_token(user),
+            "token_type": authentication.KEYWORD,
+            "expires_in": getattr(settings, 'AUTH_TOKEN_TTL', 3600),
+            "user": {
+                "id": user.id,
+                "name": user.username,
+                "email": user.email
+            }
+        })
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class TriggerWorkflowView(APIView):
     """
@@ -56,11 +130,38 @@ class TriggerWorkflowView(APIView):
     Expected request body:
     {
         "slug": "healthcheck",  # Workflow identifier
-        "payload": { ... }       # Data to send to workflow
+        "payload": { ... },      # Data to send to workflow
+        "mode": "job"            # Optional: queue the workflow and return a job id
     }
+
+    With "mode": "callback" the workflow is queued as well, and its meta block
+    carries a correlation_id (the job id) and a signed callback_url. n8n
+    acknowledges the webhook at once and POSTs the result to callback_url
+    when the workflow is done; clients wait for it on the job's status_url
+    (long-poll with ?wait=) or events_url (server-sent events).
+
+    Slugs in settings.N8N_AT_LEAST_ONCE_WORKFLOWS are forwarded synchronously
+    as usual, but when n8n can't take the trigger (timeout, network error,
+    5xx, open circuit) it is queued for retries and answered like job mode.
+
+    Bodies over settings.N8N_MAX_BODY_SIZE (or the slug's N8N_PAYLOAD_LIMITS
+    entry) are refused with 413, and payloads not matching the slug's
+    N8N_PAYLOAD_SCHEMAS entry with 400, before anything is sent to n8n.
+
+    Under settings.N8N_ADMISSION, calls to n8n wait for a slot, signed-in
+    callers ahead of anonymous ones, and get 503 when none frees up in time.
     """
     permission_classes = [AllowAny]  # TODO: Change to IsAuthenticated in production
 
+    def initial(self, request, *args, **kwargs):
+        # Ahead of authentication, whose CSRF check may read a form body
+        _check_body_size(request)
+        super().initial(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with tracing.span("auth"):
+            super().perform_authentication(request)
+
     def post(self, request):
         """Handle POST requests to trigger workflows"""
         workflow_slug = request.data.get("slug")
@@ -74,33 +175,223 @@ class TriggerWorkflowView(APIView):
             )
 
         # Look up n8n webhook URL
-        webhook_url = settings.N8N_WEBHOOKS.get(workflow_slug)
-        if not webhook_url:
+        workflow = registry.workflows.get(workflow_slug)
+        if workflow is None:
             return Response(
                 {"error": f"Workflow '{workflow_slug}' not found"}, 
                 status=status.HTTP_404_NOT_FOUND
             )
+        webhook_url = workflow.url
+
+        self._metrics_slug = workflow_slug
+        tracing.set_attribute("n8n.workflow.slug", workflow_slug)
+        _check_body_size(request, workflow_slug)
+
+        if workflow.auth_required and not request.user.is_authenticated:
+            self.permission_denied(request, message="Authentication required for this workflow")
+
+        try:
+            with metrics.timed("n8n_proxy_stage_seconds", (("slug", workflow_slug), ("stage", "validate"))):
+                with tracing.span("validate"):
+                    validation.validate_payload(workflow_slug, payload)
+        except validation.InvalidPayload as e:
+            return Response(_invalid_payload(workflow_slug, e), status=status.HTTP_400_BAD_REQUEST)
+
+        # Enforce rate limits before doing any work for the request
+        try:
+            with tracing.span("rate_limit"):
+                rate_limit.check(workflow_slug, rate_limit.client_key(request, request.user))
+        except rate_limit.RateLimited as e:
+            return Response(
+                {"error": "Too many requests"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=_rate_limited(workflow_slug, e)
+            )
 
         # Prepare enriched payload for n8n
-        n8n_payload = self._build_n8n_payload(request, payload)
+        with metrics.timed("n8n_proxy_stage_seconds", (("slug", workflow_slug), ("stage", "build_payload"))):
+            with tracing.span("build_payload"):
+                n8n_payload = self._build_n8n_payload(request, payload)
+
+        if request.data.get("mode") == "job":
+            return self._enqueue_job(request, workflow_slug, webhook_url, n8n_payload)
+        if request.data.get("mode") == "callback":
+            job_id = jobs.new_job_id()
+            n8n_payload["meta"].update(correlation_id=job_id, callback_url=callbacks.callback_url(request, job_id))
+            return self._enqueue_job(request, workflow_slug, webhook_url, n8n_payload, job_id=job_id)
         
+        return self._trigger(request, workflow_slug, webhook_url, payload, n8n_payload)
+
+    def _trigger(self, request, workflow_slug, webhook_url, payload, n8n_payload):
+        """
+        Run a validated workflow trigger and map failures onto proxy status codes
+
+        Args:
+            request: Django request object
+            workflow_slug: Workflow identifier
+            webhook_url: n8n webhook URL for the slug
+            payload: Original payload from frontend
+            n8n_payload: Enriched payload to send
+
+        Returns:
+            Response: Django REST framework response
+        """
+        # Counted as in flight until the response is ready, including cache hits
+        in_flight = (("slug", workflow_slug),)
+        metrics.registry.gauge_add("n8n_proxy_in_flight", in_flight, 1)
+        try:
+            return self._run_trigger(request, workflow_slug, webhook_url, payload, n8n_payload)
+        finally:
+            metrics.registry.gauge_add("n8n_proxy_in_flight", in_flight, -1)
+
+    def _run_trigger(self, request, workflow_slug, webhook_url, payload, n8n_payload):
+        """Serve the trigger from cache, stream, or a (coalesced) n8n call; see _trigger"""
+        # Streamed bodies are relayed as-is, so they can't be cached or shared
+        streaming = self._streams(workflow_slug)
+
+        # Serve idempotent workflows from the response cache when possible
+        workflow_cache = None if streaming else response_cache.for_slug(workflow_slug)
+        if workflow_cache is not None:
+            cache_key = workflow_cache.key(payload, request.user)
+            cached_data = workflow_cache.get(cache_key)
+            if cached_data is not None:
+                return Response(cached_data, headers={"X-Workflow-Cache": response_cache.HIT})
+
+        # Cached answers are stored as data, so they can't skip decoding
+        relay = workflow_cache is None and self._relays(workflow_slug)
+
         # Forward to n8n and handle response
         try:
-            response = self._forward_to_n8n(webhook_url, n8n_payload)
+            if streaming:
+                # The slot is held until the relayed body is closed, not just until n8n answers
+                release = admission.acquire(workflow_slug, self._priority(request))
+                try:
+                    response = self._stream_from_n8n(
+                        webhook_url, n8n_payload, workflow_slug=workflow_slug, on_close=release
+                    )
+                except BaseException:
+                    release()
+                    raise
+                if not response.streaming:
+                    release()
+                return response
+            response = self._forward_coalesced(request, workflow_slug, webhook_url, payload, n8n_payload, relay=relay)
+            if workflow_cache is not None:
+                if response.status_code == status.HTTP_200_OK:
+                    workflow_cache.set(cache_key, response.data)
+                response["X-Workflow-Cache"] = response_cache.MISS
             return response
+        except circuit_breaker.CircuitOpenError as e:
+            logger.warning("Circuit open, failing fast for workflow: %s", workflow_slug, extra={"slug": workflow_slug})
+            return Response(
+                {"error": "Workflow temporarily unavailable"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
+        except admission.Overloaded as e:
+            return Response(
+                {"error": "Too many workflows running, try again later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(e.retry_after))}
+            )
         except requests.Timeout:
-            logger.error(f"Timeout calling n8n webhook: {workflow_slug}")
+            logger.error("Timeout calling n8n webhook: %s", workflow_slug, extra={"slug": workflow_slug})
             return Response(
                 {"error": "Workflow request timed out"}, 
                 status=status.HTTP_504_GATEWAY_TIMEOUT
             )
         except requests.RequestException as e:
-            logger.error(f"Error calling n8n webhook {workflow_slug}: {str(e)}")
+            logger.error("Error calling n8n webhook %s: %s", workflow_slug, e, extra={"slug": workflow_slug})
             return Response(
                 {"error": "Failed to reach automation server"}, 
                 status=status.HTTP_502_BAD_GATEWAY
             )
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Render the response eagerly so serialization time and status can be recorded"""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        slug = getattr(self, '_metrics_slug', None) or "unknown"
+        if isinstance(response, Response) and not response.is_rendered:
+            with metrics.timed("n8n_proxy_stage_seconds", (("slug", slug), ("stage", "serialize"))):
+                with tracing.span("serialize"):
+                    response.render()
+        metrics.registry.inc("n8n_proxy_requests_total", (("slug", slug), ("status", str(response.status_code))))
+        return response
+
+    def _enqueue_job(self, request, workflow_slug, webhook_url, n8n_payload, job_id=None):
+        """
+        Queue the workflow for the background worker pool instead of waiting on n8n
+
+        Returns:
+            Response: 202 with the job id, or 503 when the queue is full
+        """
+        user_id = request.user.id if request.user.is_authenticated else None
+        try:
+            job_id = jobs.get_job_queue().submit(
+                workflow_slug, webhook_url, n8n_payload, user_id=user_id, job_id=job_id
+            )
+        except jobs.QueueFull:
+            logger.error("Job queue full, rejecting workflow: %s", workflow_slug, extra={"slug": workflow_slug})
+            return Response(
+                {"error": "Too many queued workflows, try again later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        return Response(_job_accepted(job_id, user_id), status=status.HTTP_202_ACCEPTED)
+
+    def _streams(self, workflow_slug):
+        """Whether n8n's response for this slug is relayed in chunks instead of buffered"""
+        return workflow_slug in getattr(settings, 'N8N_STREAMING_WORKFLOWS', ())
+
+    def _relays(self, workflow_slug):
+        """Whether n8n's successful JSON answer for this slug is passed on without decoding it"""
+        return workflow_slug in getattr(settings, 'N8N_RAW_RELAY_WORKFLOWS', ())
+
+    def _priority(self, request):
+        """Priority of this request's triggers when they wait for an admission slot"""
+        return admission.priority_for(request.user)
+
+    def _forward_coalesced(self, request, workflow_slug, webhook_url, payload, n8n_payload, relay=False):
+        """
+        Forward to n8n, sharing one upstream call between identical concurrent triggers
+
+        Only slugs in settings.N8N_SINGLE_FLIGHT_WORKFLOWS are coalesced: requests
+        with the same slug and canonical payload hash that arrive while a call is
+        in flight wait for it instead of starting another n8n execution. The
+        caller is part of the key for workflows that require authentication and
+        for slugs in N8N_SINGLE_FLIGHT_VARY_ON_USER.
+
+        Returns:
+            Response or HttpResponse: Django REST framework response, or the relayed body
+        """
+        def forward():
+            # Only the call that reaches n8n takes an admission slot; coalesced requests wait on it
+            with admission.slot(workflow_slug, self._priority(request)):
+                return self._forward(request, workflow_slug, webhook_url, n8n_payload, relay=relay)
+
+        if workflow_slug not in getattr(settings, 'N8N_SINGLE_FLIGHT_WORKFLOWS', ()):
+            return forward()
+
+        # Relayed answers are raw bytes, which callers expecting data (batch items) can't share
+        key_parts = {"slug": workflow_slug, "payload": payload, "relay": relay}
+        workflow = registry.workflows.get(workflow_slug, refresh=False)
+        if (workflow is not None and workflow.auth_required) or \
+                workflow_slug in getattr(settings, 'N8N_SINGLE_FLIGHT_VARY_ON_USER', ()):
+            key_parts["user"] = request.user.id if request.user.is_authenticated else None
+        key = response_cache.canonical_hash(key_parts)
+
+        response, shared = singleflight.workflow_calls.do(key, forward)
+        if shared:
+            # Each waiting request needs its own Response object to render
+            if not isinstance(response, Response):
+                shared_response = HttpResponse(
+                    response.content, status=response.status_code, content_type=response["Content-Type"]
+                )
+                shared_response["X-Workflow-Coalesced"] = "true"
+                return shared_response
+            return Response(response.data, status=response.status_code, headers={"X-Workflow-Coalesced": "true"})
+        return response
+
     def _build_n8n_payload(self, request, payload):
         """
         Build enriched payload for n8n with user metadata
@@ -112,74 +403,950 @@ class TriggerWorkflowView(APIView):
         Returns:
             dict: Enriched payload with user metadata
         """
-        return {
-            "input": payload,
-            "meta": {
-                "user_id": request.user.id if request.user.is_authenticated else None,
-                "user_name": request.user.username if request.user.is_authenticated else "anonymous",
-                "timestamp": timezone.now().isoformat(),
-                "source": "django-api"
-            }
-        }
+        return _enrich_payload(request.user, payload)
+
+    def _forward(self, request, workflow_slug, webhook_url, n8n_payload, relay=False):
+        """
+        Make one n8n call; failed deliveries of at-least-once slugs are queued for retry
+
+        Returns:
+            Response or HttpResponse: Proxied response, or 202 with the job id retrying the delivery
+
+        Raises:
+            CircuitOpenError, requests.RequestException: As _forward_to_n8n, for other slugs
+        """
+        if jobs.retry_policy(workflow_slug) is None:
+            return self._forward_to_n8n(webhook_url, n8n_payload, workflow_slug=workflow_slug, relay=relay)
+
+        delivery_id = jobs.new_job_id()
+        try:
+            return self._forward_to_n8n(
+                webhook_url, n8n_payload, workflow_slug=workflow_slug, delivery_id=delivery_id, relay=relay
+            )
+        except (circuit_breaker.CircuitOpenError, requests.RequestException, jobs.RetryableError) as e:
+            user_id = request.user.id if request.user.is_authenticated else None
+            response_data, response_status = _queue_redelivery(
+                workflow_slug, webhook_url, n8n_payload, delivery_id, user_id, e
+            )
+            return Response(response_data, status=response_status)
 
-    def _forward_to_n8n(self, webhook_url, payload):
+    def _forward_to_n8n(self, webhook_url, payload, workflow_slug=None, delivery_id=None, relay=False):
         """
         Forward request to n8n webhook and return proxied response
         
         Args:
             webhook_url: n8n webhook URL
             payload: Enriched payload to send
+            workflow_slug: Workflow identifier selecting timeouts and circuit breaker
+            delivery_id: Id of an at-least-once delivery, sent as X-Delivery-Id
+            relay: Pass a successful JSON body on as raw bytes instead of decoding it
             
         Returns:
-            Response: Django REST framework response
+            Response or HttpResponse: Django REST framework response, or the relayed body
             
         Raises:
+            CircuitOpenError: If the workflow's circuit breaker is open
             requests.Timeout: If n8n doesn't respond in time
             requests.RequestException: For other network errors
+            RetryableError: If n8n answers a delivery with a 5xx status
         """
-        headers = {
-            "Content-Type": "application/json",
-        }
-        
-        # Add authentication header if configured
-        if hasattr(settings, 'N8N_SECRET_KEY') and settings.N8N_SECRET_KEY:
-            headers["X-Internal-Secret"] = settings.N8N_SECRET_KEY
-
-        logger.info(f"Proxying to n8n: {webhook_url}")
-        logger.debug(f"Payload: {payload}")
-
-        # Make request to n8n
-        resp = requests.post(
-            webhook_url,
-            json=payload,
-            headers=headers,
-            timeout=10,  # 10 second timeout for workflow execution
-            allow_redirects=False
+        logger.info("Proxying to n8n: %s", webhook_url, extra={"slug": workflow_slug})
+        logger.debug("Payload: %s", payload, extra={"slug": workflow_slug})
+
+        resp = self._post_to_n8n(workflow_slug, webhook_url, payload, delivery_id=delivery_id)
+
+        logger.info("n8n response: %s", resp.status_code, extra={"slug": workflow_slug, "status": resp.status_code})
+
+        if relay and _is_relayable(resp.status_code, resp.headers, resp.content):
+            return HttpResponse(resp.content, content_type=resp.headers["Content-Type"])
+
+        response_data, response_status = _map_n8n_response(resp.status_code, resp.text, resp.json)
+        if delivery_id is not None and resp.status_code >= 500:
+            raise jobs.RetryableError(response_status, response_data)
+        return Response(response_data, status=response_status)
+
+    def _stream_from_n8n(self, webhook_url, payload, workflow_slug=None, on_close=None):
+        """
+        Forward request to n8n and relay a successful body in chunks
+
+        The upstream body is never buffered or decoded, so memory use stays
+        flat for large reports and file exports. Non-200 answers are small and
+        go through the usual status mapping.
+
+        Args:
+            webhook_url: n8n webhook URL
+            payload: Enriched payload to send
+            workflow_slug: Workflow identifier selecting timeouts and circuit breaker
+            on_close: Called once the relayed body is closed (only for a streamed answer)
+
+        Returns:
+            StreamingHttpResponse or Response: Relayed body, or mapped status
+
+        Raises:
+            CircuitOpenError: If the workflow's circuit breaker is open
+            requests.Timeout: If n8n doesn't respond in time
+            requests.RequestException: For other network errors
+        """
+        logger.info("Streaming from n8n: %s", webhook_url, extra={"slug": workflow_slug})
+
+        resp = self._post_to_n8n(workflow_slug, webhook_url, payload, stream=True)
+
+        logger.info("n8n response: %s", resp.status_code, extra={"slug": workflow_slug, "status": resp.status_code})
+
+        if resp.status_code != status.HTTP_200_OK:
+            try:
+                response_data, response_status = _map_n8n_response(resp.status_code, resp.text, resp.json)
+            finally:
+                resp.close()
+            return Response(response_data, status=response_status)
+
+        response = StreamingHttpResponse(
+            _RelayedBody(resp, getattr(settings, 'N8N_STREAM_CHUNK_SIZE', 64 * 1024), on_close),
+            content_type=resp.headers.get("Content-Type", "application/octet-stream"),
         )
+        if "Content-Disposition" in resp.headers:
+            response["Content-Disposition"] = resp.headers["Content-Disposition"]
+        # iter_content decodes gzip/deflate, so the upstream length only holds for identity bodies
+        if "Content-Length" in resp.headers and "Content-Encoding" not in resp.headers:
+            response["Content-Length"] = resp.headers["Content-Length"]
+        return response
 
-        logger.info(f"n8n response: {resp.status_code}")
-        
-        # Parse n8n's response
+    def _post_to_n8n(self, workflow_slug, webhook_url, payload, delivery_id=None, **kwargs):
+        """
+        POST to n8n under the slug's connect/read timeouts and circuit breaker
+
+        Network errors, n8n 5xx answers and slow calls count against the
+        breaker; while it is open no request is sent at all. Load-balanced
+        slugs have a breaker per n8n instance (see api.load_balancer.call).
+
+        Returns:
+            requests.Response: Raw n8n response
+
+        Raises:
+            CircuitOpenError: If the workflow's circuit breaker is open
+            requests.RequestException: For network errors and timeouts
+        """
+        slug_labels = (("slug", workflow_slug or "unknown"),)
+        started = time.monotonic()
         try:
-            response_data = resp.json() if resp.text else {}
-        except ValueError:
-            response_data = {"message": resp.text}
+            # The upstream span is the parent n8n sees in the traceparent header
+            with tracing.span("upstream", tracing.CLIENT, **{"http.url": webhook_url}) as upstream:
+                body, headers = _n8n_body(payload, delivery_id)
+                timeout = circuit_breaker.timeout_for(workflow_slug)
+
+                def send(url):
+                    if upstream is not None:
+                        upstream.attributes["http.url"] = url
+                    # Make request to n8n over the pooled keep-alive session for its host
+                    return n8n_client.post(
+                        url,
+                        **({"json": payload} if body is None else {"data": body}),
+                        headers=headers,
+                        timeout=timeout,
+                        allow_redirects=False,
+                        **kwargs
+                    )
+
+                # Slugs with several n8n instances pick one, and try another if it can't be reached
+                resp = load_balancer.call(workflow_slug, webhook_url, send)
+                if upstream is not None:
+                    upstream.attributes["http.status_code"] = resp.status_code
+        except circuit_breaker.CircuitOpenError:
+            raise
+        except BaseException as e:
+            elapsed = time.monotonic() - started
+            metrics.registry.observe("n8n_proxy_stage_seconds", slug_labels + (("stage", "upstream"),), elapsed)
+            if isinstance(e, requests.Timeout):
+                metrics.registry.inc("n8n_proxy_upstream_timeouts_total", slug_labels)
+            else:
+                metrics.registry.inc("n8n_proxy_upstream_errors_total", slug_labels)
+            raise
+
+        elapsed = time.monotonic() - started
+        metrics.registry.observe("n8n_proxy_stage_seconds", slug_labels + (("stage", "upstream"),), elapsed)
+        return resp
+
+
+class _RelayedBody:
+    """
+    Iterates the upstream body chunk by chunk, releasing the connection when done
+
+    Unlike a generator, close() also runs when the body was never iterated
+    (e.g. the client went away), so on_close always gets called.
+    """
+
+    def __init__(self, resp, chunk_size, on_close=None):
+        self._resp = resp
+        self._chunks = resp.iter_content(chunk_size=chunk_size)
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        return self
 
-        # Map n8n status codes to appropriate responses
-        if resp.status_code == 200:
-            return Response(response_data, status=status.HTTP_200_OK)
-        elif resp.status_code == 204:
-            # n8n returned success with no content
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._resp.close()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class TriggerBatchWorkflowView(TriggerWorkflowView):
+    """
+    Triggers several n8n workflows in one request, forwarding them concurrently
+
+    Expected request body:
+    {
+        "items": [
+            {"slug": "healthcheck", "payload": { ... }},
+            ...
+        ]
+    }
+
+    Every item is validated before anything is sent. Results are returned in
+    request order, each with the status the single trigger endpoint would use.
+    """
+
+    def post(self, request):
+        """Handle POST requests to trigger a batch of workflows"""
+        items = request.data.get("items")
+        if not isinstance(items, list) or not items:
             return Response(
-                {"status": "success", "message": "Workflow triggered"}, 
-                status=status.HTTP_200_OK
+                {"error": "Field 'items' must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        elif resp.status_code >= 400:
-            logger.error(f"n8n error response: {resp.text}")
+
+        max_items = getattr(settings, 'N8N_BATCH_MAX_ITEMS', 50)
+        if len(items) > max_items:
             return Response(
-                {"error": "Workflow execution failed", "details": response_data}, 
+                {"error": f"A batch may contain at most {max_items} items"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate the whole batch up front so nothing is sent for a bad request
+        errors = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get("slug"):
+                errors[index] = "Missing required field: 'slug'"
+                continue
+            workflow = registry.workflows.get(item["slug"])
+            if workflow is None:
+                errors[index] = f"Workflow '{item['slug']}' not found"
+            elif workflow.auth_required and not request.user.is_authenticated:
+                errors[index] = "Authentication required for this workflow"
+            else:
+                try:
+                    validation.validate_payload(item["slug"], item.get("payload", {}))
+                except validation.InvalidPayload as e:
+                    errors[index] = f"Invalid payload: {e}"
+                    _payload_rejected(item["slug"], "invalid")
+        if errors:
+            return Response(
+                {"error": "Invalid batch", "items": errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Every item takes a token, so a batch can't be used to get around the limits
+        client = rate_limit.client_key(request, request.user)
+        slug_counts = {}
+        for item in items:
+            slug_counts[item["slug"]] = slug_counts.get(item["slug"], 0) + 1
+        for slug, count in slug_counts.items():
+            try:
+                rate_limit.check(slug, client, cost=count)
+            except rate_limit.RateLimited as e:
+                return Response(
+                    {"error": "Too many requests"},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers=_rate_limited(slug, e)
+                )
+
+        calls = []
+        for item in items:
+            payload = item.get("payload", {})
+            calls.append((
+                item["slug"],
+                registry.workflows.get(item["slug"], refresh=False).url,
+                payload,
+                self._build_n8n_payload(request, payload),
+            ))
+
+        parallelism = min(getattr(settings, 'N8N_BATCH_PARALLELISM', 8), len(calls))
+        # Each item runs in a copy of this request's context, so its spans join the request's trace
+        contexts = [copy_context() for _ in calls]
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="n8n-batch") as executor:
+            responses = list(executor.map(
+                lambda context, call: context.run(self._trigger, request, *call), contexts, calls
+            ))
+
+        return Response({
+            "results": [
+                {"slug": call[0], "status": response.status_code, "data": response.data}
+                for call, response in zip(calls, responses)
+            ]
+        })
+
+    def _streams(self, workflow_slug):
+        # Batch results are embedded in one JSON envelope, so they are always buffered
+        return False
+
+    def _relays(self, workflow_slug):
+        return False
+
+    def _priority(self, request):
+        # Batches queue behind single triggers, whoever sends them
+        return admission.priority_for(request.user, bulk=True)
+
+
+def run_workflow_job(job):
+    """
+    Forward a queued workflow job to n8n (executor for api.jobs.JobQueue)
+
+    Args:
+        job: Job dict claimed from the job store
+
+    Returns:
+        tuple: (HTTP status, response data) as the synchronous trigger would return them
+
+    Raises:
+        RetryableError: If n8n is unreachable, times out, answers 5xx or its circuit is open
+        AwaitingCallback: If n8n accepted a callback-mode job, whose result it posts later
+    """
+    try:
+        response = TriggerWorkflowView()._forward_to_n8n(
+            job["webhook_url"], job["payload"], workflow_slug=job["slug"], delivery_id=job["id"]
+        )
+        if "callback_url" in job["payload"].get("meta", {}) and response.status_code < 400:
+            raise jobs.AwaitingCallback(response.status_code, response.data)
+        return response.status_code, response.data
+    except circuit_breaker.CircuitOpenError as e:
+        logger.warning("Circuit open, failing job %s: %s", job["id"], job["slug"], extra={"slug": job["slug"]})
+        raise jobs.RetryableError(
+            status.HTTP_503_SERVICE_UNAVAILABLE, {"error": "Workflow temporarily unavailable"}, e.retry_after
+        )
+    except requests.Timeout:
+        logger.error(
+            "Timeout calling n8n webhook for job %s: %s", job["id"], job["slug"], extra={"slug": job["slug"]}
+        )
+        raise jobs.RetryableError(status.HTTP_504_GATEWAY_TIMEOUT, {"error": "Workflow request timed out"})
+    except requests.RequestException as e:
+        logger.error(
+            "Error calling n8n webhook for job %s %s: %s", job["id"], job["slug"], e, extra={"slug": job["slug"]}
+        )
+        raise jobs.RetryableError(status.HTTP_502_BAD_GATEWAY, {"error": "Failed to reach automation server"})
+
+
+class WorkflowJobView(APIView):
+    """
+    Returns the status and, once finished, the result of a queued workflow job
+
+    With ?wait=<seconds> (at most settings.N8N_JOB_MAX_WAIT) the request is
+    held until the job finishes or the time is up (long-poll). A job queued by
+    a signed-in user is only shown to them; an anonymous one needs the
+    ?token= given out with its id, as the status_url carries.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, job_id):
+        try:
+            wait = min(float(request.query_params.get("wait", 0)), getattr(settings, 'N8N_JOB_MAX_WAIT', 30))
+        except ValueError:
+            return Response({"error": "'wait' must be a number of seconds"}, status=status.HTTP_400_BAD_REQUEST)
+
+        store = jobs.get_job_queue().store
+        job = store.get(job_id)
+        if not _job_visible(job, request.user, request.query_params.get("token")):
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if wait > 0:
+            job = callbacks.wait_for_job(store, job_id, wait)
+        else:
+            job = callbacks.expire_overdue(store, job)
+        return Response(_job_data(job))
+
+
+class WorkflowJobEventsView(View):
+    """
+    Streams a workflow job's status as server-sent events until it finishes
+
+    Sends a "status" event right away, another whenever the status changes,
+    and keep-alive comments in between. The stream ends once the job has
+    finished or after settings.N8N_JOB_EVENTS_TIMEOUT seconds; EventSource
+    clients reconnect on their own. Runs without holding a thread under ASGI;
+    under WSGI each open stream holds a worker thread.
+    """
+
+    async def get(self, request, job_id):
+        try:
+            user = await authentication.aauthenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+
+        store = (await sync_to_async(jobs.get_job_queue)()).store
+        job = await sync_to_async(store.get)(job_id)
+        if not _job_visible(job, user, request.GET.get("token")):
+            return JsonResponse({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Under WSGI Django reads an async iterator to the end before sending
+        # anything, so the events would only arrive once the job was done
+        events = _job_events(store, job) if isinstance(request, ASGIRequest) else _job_events_blocking(store, job)
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        # no-transform keeps the events from being compressed (and so buffered) on the way
+        response["Cache-Control"] = "no-cache, no-transform"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+async def _job_events(store, job):
+    """Yield server-sent events for a job until it finishes or the stream times out"""
+    yield _sse("status", _job_data(job))
+    deadline = time.monotonic() + getattr(settings, 'N8N_JOB_EVENTS_TIMEOUT', 300)
+    heartbeat = getattr(settings, 'N8N_JOB_EVENTS_HEARTBEAT', 15)
+    last_status = job["status"]
+    while last_status not in jobs.FINISHED:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        job = await callbacks.await_job(store, job["id"], min(remaining, heartbeat))
+        if job is None:
+            return
+        if job["status"] != last_status:
+            last_status = job["status"]
+            yield _sse("status", _job_data(job))
+        else:
+            yield b": keep-alive\n\n"
+
+
+def _job_events_blocking(store, job):
+    """Counterpart of _job_events for WSGI servers, waiting on the job in the worker thread"""
+    yield _sse("status", _job_data(job))
+    deadline = time.monotonic() + getattr(settings, 'N8N_JOB_EVENTS_TIMEOUT', 300)
+    heartbeat = getattr(settings, 'N8N_JOB_EVENTS_HEARTBEAT', 15)
+    last_status = job["status"]
+    while last_status not in jobs.FINISHED:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        job = callbacks.wait_for_job(store, job["id"], min(remaining, heartbeat))
+        if job is None:
+            return
+        if job["status"] != last_status:
+            last_status = job["status"]
+            yield _sse("status", _job_data(job))
+        else:
+            yield b": keep-alive\n\n"
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class WorkflowCallbackView(APIView):
+    """
+    Receives the result of a callback-mode job from n8n
+
+    n8n POSTs the workflow's result to the callback_url from the meta block.
+    The URL is signed with N8N_SECRET_KEY and expires after
+    settings.N8N_CALLBACK_TIMEOUT, so it authenticates the call by itself.
+    A failed run is reported by sending an X-Workflow-Status header with an
+    HTTP status of 400 or more.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, token):
+        try:
+            job_id = callbacks.verify_callback_token(token)
+        except signing.BadSignature:
+            return Response({"error": "Invalid or expired callback URL"}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            http_status = int(request.headers.get("X-Workflow-Status", status.HTTP_200_OK))
+        except ValueError:
+            return Response({"error": "Invalid X-Workflow-Status header"}, status=status.HTTP_400_BAD_REQUEST)
+
+        state = jobs.SUCCEEDED if http_status < 400 else jobs.FAILED
+        store = jobs.get_job_queue().store
+        if not store.complete(job_id, state, http_status, request.data):
+            return Response({"error": "Job not found or already finished"}, status=status.HTTP_409_CONFLICT)
+        jobs.notify(job_id)
+
+        job = store.get(job_id)
+        metrics.registry.inc("n8n_job_callbacks_total", (("slug", job["slug"]), ("outcome", state)))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class WorkflowJobStatsView(APIView):
+    """
+    Exposes the depth of the job queue, including deliveries waiting for a retry
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        store = jobs.get_job_queue().store
+        return Response({
+            "pending": store.pending_count(),
+            "dead_letters": store.dead_letter_count(),
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTriggerWorkflowView(View):
+    """
+    Non-blocking variant of TriggerWorkflowView for the ASGI entry point
+    Awaits n8n over a pooled httpx.AsyncClient so slow workflows don't hold a worker thread
+
+    Accepts the same request body as TriggerWorkflowView, "job" and "callback"
+    modes included. Bearer tokens and sessions are resolved here directly,
+    since DRF authentication is synchronous.
+    """
+
+    async def post(self, request):
+        """Handle POST requests to trigger workflows"""
+        try:
+            _check_body_size(request)
+            raw_body = request.body
+            # Chunked uploads have no Content-Length to go by
+            _check_body_size(request, size=len(raw_body))
+        except validation.PayloadTooLarge as e:
+            return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+        try:
+            body = fast_json.loads(raw_body or b'{}')
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(body, dict):
+            return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+
+        workflow_slug = body.get("slug")
+        payload = body.get("payload", {})
+
+        if not workflow_slug:
+            return JsonResponse(
+                {"error": "Missing required field: 'slug'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        workflow = await registry.workflows.aget(workflow_slug)
+        if workflow is None:
+            return JsonResponse(
+                {"error": f"Workflow '{workflow_slug}' not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        webhook_url = workflow.url
+        tracing.set_attribute("n8n.workflow.slug", workflow_slug)
+        try:
+            _check_body_size(request, workflow_slug, size=len(raw_body))
+        except validation.PayloadTooLarge as e:
+            return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+
+        # Deferred like in api.n8n_client: only the ASGI path needs httpx
+        import httpx
+
+        try:
+            with tracing.span("auth"):
+                user = await authentication.aauthenticate(request)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        except exceptions.PermissionDenied as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_403_FORBIDDEN)
+        if workflow.auth_required and not user.is_authenticated:
+            return JsonResponse(
+                {"error": "Authentication required for this workflow"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            with tracing.span("validate"):
+                validation.validate_payload(workflow_slug, payload)
+        except validation.InvalidPayload as e:
+            return JsonResponse(_invalid_payload(workflow_slug, e), status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with tracing.span("rate_limit"):
+                rate_limit.check(workflow_slug, rate_limit.client_key(request, user))
+        except rate_limit.RateLimited as e:
+            return JsonResponse(
+                {"error": "Too many requests"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers=_rate_limited(workflow_slug, e)
+            )
+        with tracing.span("build_payload"):
+            n8n_payload = _enrich_payload(user, payload)
+
+        mode = body.get("mode")
+        if mode in ("job", "callback"):
+            return await sync_to_async(self._enqueue_job)(request, user, workflow_slug, webhook_url, n8n_payload, mode)
+
+        try:
+            async with admission.aslot(workflow_slug, admission.priority_for(user)):
+                return await self._forward(user, workflow_slug, webhook_url, n8n_payload)
+        except circuit_breaker.CircuitOpenError as e:
+            logger.warning("Circuit open, failing fast for workflow: %s", workflow_slug, extra={"slug": workflow_slug})
+            response = JsonResponse(
+                {"error": "Workflow temporarily unavailable"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response["Retry-After"] = str(math.ceil(e.retry_after))
+            return response
+        except admission.Overloaded as e:
+            response = JsonResponse(
+                {"error": "Too many workflows running, try again later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response["Retry-After"] = str(math.ceil(e.retry_after))
+            return response
+        except httpx.TimeoutException:
+            logger.error("Timeout calling n8n webhook: %s", workflow_slug, extra={"slug": workflow_slug})
+            return JsonResponse(
+                {"error": "Workflow request timed out"},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+        except httpx.HTTPError as e:
+            logger.error("Error calling n8n webhook %s: %s", workflow_slug, e, extra={"slug": workflow_slug})
+            return JsonResponse(
+                {"error": "Failed to reach automation server"},
                 status=status.HTTP_502_BAD_GATEWAY
             )
-        
-        # Default: return whatever n8n returned
-        return Response(response_data, status=resp.status_code)
\ No newline at end of file
+
+    def _enqueue_job(self, request, user, workflow_slug, webhook_url, n8n_payload, mode):
+        """Counterpart of TriggerWorkflowView._enqueue_job, for the "job" and "callback" modes"""
+        job_id = jobs.new_job_id()
+        if mode == "callback":
+            n8n_payload["meta"].update(correlation_id=job_id, callback_url=callbacks.callback_url(request, job_id))
+        user_id = user.id if user.is_authenticated else None
+        try:
+            job_id = jobs.get_job_queue().submit(
+                workflow_slug, webhook_url, n8n_payload, user_id=user_id, job_id=job_id
+            )
+        except jobs.QueueFull:
+            logger.error("Job queue full, rejecting workflow: %s", workflow_slug, extra={"slug": workflow_slug})
+            return JsonResponse(
+                {"error": "Too many queued workflows, try again later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return JsonResponse(_job_accepted(job_id, user_id), status=status.HTTP_202_ACCEPTED)
+
+    async def _forward(self, user, workflow_slug, webhook_url, n8n_payload):
+        """Async counterpart of TriggerWorkflowView._forward"""
+        relay = workflow_slug in getattr(settings, 'N8N_RAW_RELAY_WORKFLOWS', ())
+        if jobs.retry_policy(workflow_slug) is None:
+            return await self._forward_to_n8n(webhook_url, n8n_payload, workflow_slug=workflow_slug, relay=relay)
+
+        import httpx
+
+        delivery_id = jobs.new_job_id()
+        try:
+            return await self._forward_to_n8n(
+                webhook_url, n8n_payload, workflow_slug=workflow_slug, delivery_id=delivery_id, relay=relay
+            )
+        except (circuit_breaker.CircuitOpenError, httpx.HTTPError, jobs.RetryableError) as e:
+            user_id = user.id if user.is_authenticated else None
+            response_data, response_status = await sync_to_async(_queue_redelivery)(
+                workflow_slug, webhook_url, n8n_payload, delivery_id, user_id, e
+            )
+            return JsonResponse(response_data, status=response_status)
+
+    async def _forward_to_n8n(self, webhook_url, payload, workflow_slug=None, delivery_id=None, relay=False):
+        """
+        Forward request to n8n webhook without blocking the event loop
+
+        Args:
+            webhook_url: n8n webhook URL
+            payload: Enriched payload to send
+            workflow_slug: Workflow identifier selecting timeouts and circuit breaker
+            delivery_id: Id of an at-least-once delivery, sent as X-Delivery-Id
+            relay: Pass a successful JSON body on as raw bytes instead of decoding it
+
+        Returns:
+            JsonResponse or HttpResponse: Proxied response, or the relayed body
+
+        Raises:
+            CircuitOpenError: If the workflow's circuit breaker is open
+            httpx.TimeoutException: If n8n doesn't respond in time
+            httpx.HTTPError: For other network errors
+            RetryableError: If n8n answers a delivery with a 5xx status
+        """
+        import httpx
+
+        logger.info("Proxying to n8n (async): %s", webhook_url, extra={"slug": workflow_slug})
+
+        connect_timeout, read_timeout = circuit_breaker.timeout_for(workflow_slug)
+        with tracing.span("upstream", tracing.CLIENT, **{"http.url": webhook_url}) as upstream:
+            body, headers = _n8n_body(payload, delivery_id)
+
+            async def send(url):
+                if upstream is not None:
+                    upstream.attributes["http.url"] = url
+                return await n8n_client.apost(
+                    url,
+                    **({"json": payload} if body is None else {"content": body}),
+                    headers=headers,
+                    timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                )
+
+            # Runs under the circuit breaker, per n8n instance for load-balanced slugs
+            resp = await load_balancer.acall(workflow_slug, webhook_url, send)
+            if upstream is not None:
+                upstream.attributes["http.status_code"] = resp.status_code
+
+        logger.info("n8n response: %s", resp.status_code, extra={"slug": workflow_slug, "status": resp.status_code})
+
+        if relay and _is_relayable(resp.status_code, resp.headers, resp.content):
+            return HttpResponse(resp.content, content_type=resp.headers["Content-Type"])
+
+        response_data, response_status = _map_n8n_response(resp.status_code, resp.text, resp.json)
+        if delivery_id is not None and resp.status_code >= 500:
+            raise jobs.RetryableError(response_status, response_data)
+        return JsonResponse(response_data, status=response_status, safe=False)
+
+
+def _rate_limited(workflow_slug, error):
+    """Log and count a trigger rejected by api.rate_limit; returns the headers for its 429 answer"""
+    logger.warning(
+        "Rate limit (%s) exceeded for workflow: %s", error.scope.lower(), workflow_slug, extra={"slug": workflow_slug}
+    )
+    metrics.registry.inc("n8n_proxy_rate_limited_total", (("slug", workflow_slug), ("scope", error.scope.lower())))
+    return {"Retry-After": str(math.ceil(error.retry_after))}
+
+
+def _check_body_size(request, workflow_slug=None, size=None):
+    """Raise validation.PayloadTooLarge, counting the rejection, when a trigger body is over its limit"""
+    try:
+        validation.check_body_size(request, workflow_slug, size)
+    except validation.PayloadTooLarge:
+        _payload_rejected(workflow_slug or "unknown", "too_large")
+        raise
+
+
+def _invalid_payload(workflow_slug, error):
+    """Count a payload that failed its schema and build the 400 body listing what is wrong"""
+    _payload_rejected(workflow_slug, "invalid")
+    return {"error": "Invalid payload", "details": error.errors}
+
+
+def _payload_rejected(workflow_slug, reason):
+    metrics.registry.inc("n8n_proxy_payloads_rejected_total", (("slug", workflow_slug), ("reason", reason)))
+
+
+def _job_accepted(job_id, user_id):
+    """
+    Body of the 202 answer for a trigger handed to the job queue
+
+    An anonymous caller also gets the job's token, which its status and
+    events URLs carry as ?token=.
+    """
+    if user_id is not None:
+        query, extra = "", {}
+    else:
+        token = jobs.job_token(job_id)
+        query, extra = "?" + urlencode({"token": token}), {"job_token": token}
+    return {
+        "job_id": job_id,
+        "status": jobs.QUEUED,
+        "status_url": reverse('workflow-job', args=[job_id]) + query,
+        "events_url": reverse('workflow-job-events', args=[job_id]) + query,
+        **extra,
+    }
+
+
+def _job_visible(job, user, token):
+    """
+    Whether a job exists and may be read by the caller
+
+    Jobs started by a signed-in user are theirs alone; anonymous jobs need the
+    token handed out with the job id.
+    """
+    if job is None:
+        return False
+    if job["user_id"] is None:
+        return constant_time_compare(token or "", jobs.job_token(job["id"]))
+    return job["user_id"] == user.id
+
+
+def _job_data(job):
+    """Public representation of a workflow job"""
+    return {
+        "job_id": job["id"],
+        "slug": job["slug"],
+        "status": job["status"],
+        "http_status": job["http_status"],
+        "result": job["result"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+def _sse(event, data):
+    """Encode one server-sent event with a JSON data line"""
+    return f"event: {event}\ndata: ".encode() + fast_json.dumps(data) + b"\n\n"
+
+
+def _queue_redelivery(workflow_slug, webhook_url, n8n_payload, delivery_id, user_id, error):
+    """
+    Hand a failed at-least-once delivery to the job queue, which retries it with backoff
+
+    The first attempt already happened, so the job starts with one attempt
+    used and waits out the first backoff (or the open circuit) before it is due.
+
+    Returns:
+        tuple: (response data, HTTP status) - 202 with the job id, or 503 when the queue is full
+    """
+    delay = max(jobs.backoff(jobs.retry_policy(workflow_slug), 1), getattr(error, 'retry_after', 0))
+    logger.warning(
+        "Delivery %s of workflow %s failed (%s), retrying in %.1fs", delivery_id, workflow_slug, error, delay,
+        extra={"slug": workflow_slug, "delivery_id": delivery_id}
+    )
+    try:
+        jobs.get_job_queue().submit(
+            workflow_slug, webhook_url, n8n_payload, user_id=user_id, job_id=delivery_id, delay=delay, attempts=1
+        )
+    except jobs.QueueFull:
+        logger.error(
+            "Job queue full, dropping delivery %s of workflow: %s", delivery_id, workflow_slug,
+            extra={"slug": workflow_slug, "delivery_id": delivery_id}
+        )
+        return {"error": "Too many queued workflows, try again later"}, status.HTTP_503_SERVICE_UNAVAILABLE
+
+    metrics.registry.inc("n8n_proxy_deliveries_queued_total", (("slug", workflow_slug),))
+    return _job_accepted(delivery_id, user_id), status.HTTP_202_ACCEPTED
+
+
+def _enrich_payload(user, payload):
+    """Wrap the frontend payload with metadata about the requesting user"""
+    return {
+        "input": payload,
+        "meta": {
+            "user_id": user.id if user.is_authenticated else None,
+            "user_name": user.username if user.is_authenticated else "anonymous",
+            "timestamp": timezone.now().isoformat(),
+            "source": "django-api",
+            "trace_id": tracing.current_trace_id(),
+        }
+    }
+
+
+def _n8n_headers(delivery_id=None):
+    """Build the headers sent with every n8n webhook call"""
+    headers = {
+        "Content-Type": "application/json",
+    }
+
+    # Add authentication header if configured
+    if hasattr(settings, 'N8N_SECRET_KEY') and settings.N8N_SECRET_KEY:
+        headers["X-Internal-Secret"] = settings.N8N_SECRET_KEY
+
+    # Same on every attempt of a delivery, so n8n can drop duplicates of retried triggers
+    if delivery_id is not None:
+        headers["X-Delivery-Id"] = delivery_id
+
+    # Continues the caller's trace, with the upstream call as n8n's parent span
+    headers.update(tracing.outbound_headers())
+    return headers
+
+
+def _is_relayable(status_code, headers, content):
+    """Whether an n8n answer is a non-empty JSON 200 that can be passed on unchanged"""
+    if status_code != 200 or not content:
+        return False
+    media_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+    return media_type == "application/json" or media_type.endswith("+json")
+
+
+def _n8n_body(payload, delivery_id=None):
+    """
+    Encode an n8n webhook call, compressing its body when settings.N8N_REQUEST_ENCODING is set
+
+    Returns:
+        tuple: (encoded body, or None to send `payload` as plain JSON, headers)
+    """
+    headers = _n8n_headers(delivery_id)
+    if not getattr(settings, 'N8N_REQUEST_ENCODING', None):
+        return None, headers
+    body, encoding = compression.encode_request_body(fast_json.dumps(payload))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def _map_n8n_response(status_code, text, parse_json):
+    """
+    Map an n8n webhook response onto the body and status returned to the client
+
+    Args:
+        status_code: HTTP status returned by n8n
+        text: Raw response body
+        parse_json: Callable decoding the body as JSON
+
+    Returns:
+        tuple: (response data, HTTP status)
+    """
+    # Parse n8n's response
+    try:
+        response_data = parse_json() if text else {}
+    except ValueError:
+        response_data = {"message": text}
+
+    # Map n8n status codes to appropriate responses
+    if status_code == 200:
+        return response_data, status.HTTP_200_OK
+    elif status_code == 204:
+        # n8n returned success with no content
+        return {"status": "success", "message": "Workflow triggered"}, status.HTTP_200_OK
+    elif status_code >= 400:
+        logger.error("n8n error response: %s", text, extra={"status": status_code})
+        return {"error": "Workflow execution failed", "details": response_data}, status.HTTP_502_BAD_GATEWAY
+
+    # Default: return whatever n8n returned
+    return response_data, status_code
+
+
+class MetricsView(View):
+    """
+    Prometheus scrape endpoint aggregating every worker process
+
+    Series are labelled with n8n hosts, so scrapes need the
+    settings.METRICS_TOKEN bearer token or a staff session.
+    """
+
+    def get(self, request):
+        if not self._may_scrape(request):
+            response = JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+            response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+            return response
+        return HttpResponse(
+            metrics.render(metrics.collect()),
+            content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    def _may_scrape(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        if token:
+            scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+            if scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token):
+                return True
+        return request.user.is_staff
+
+
+class N8NPoolStatsView(APIView):
+    """
+    Exposes connection pool statistics for the n8n HTTP sessions, and the
+    state of each n8n instance of load-balanced slugs under "upstreams"
+
+    Staff only: it lists the n8n hosts behind the proxy.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({**n8n_client.pool_stats(), "upstreams": load_balancer.upstream_stats()})
@@ -0,0 +1,85 @@
+"""
+Local stand-in for n8n webhooks used by the benchmark suite
+Answers every POST after a configurable latency, with a configurable error rate and body size
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeN8NHandler(BaseHTTPRequestHandler):
+    """Webhook handler; behaviour comes from the attributes of the server it runs on"""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per keep-alive call
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        if server.latency:
+            time.sleep(max(random.gauss(server.latency, server.latency_jitter), 0))
+
+        if random.random() < server.error_rate:
+            status_code, body = 500, b'{"error": "simulated failure"}'
+        else:
+            status_code, body = 200, server.body
+
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeN8NServer(ThreadingHTTPServer):
+    """
+    Threaded fake n8n server
+
+    Args:
+        port: Port to listen on (0 picks a free one)
+        latency: Mean seconds before answering
+        latency_jitter: Standard deviation of the latency
+        error_rate: Share of requests answered with 500
+        payload_size: Approximate size in bytes of the JSON body returned
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.05, latency_jitter=0.0, error_rate=0.0, payload_size=256):
+        super().__init__(('127.0.0.1', port), FakeN8NHandler)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.body = json.dumps({"result": "ok", "data": "x" * max(payload_size - 30, 0)}).encode()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/webhook/bench"
+
+    def start(self):
+        """Serve from a background thread and return self"""
+        threading.Thread(target=self.serve_forever, name="fake-n8n", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=5679)
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Latency standard deviation in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 500')
+    parser.add_argument('--payload-size', type=int, default=256, help='Response body size in bytes')
+    args = parser.parse_args()
+
+    server = FakeN8NServer(args.port, args.latency, args.jitter, args.error_rate, args.payload_size)
+    print(f"Fake n8n listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of the JSON paths a workflow result can take through the proxy
+Times decode + render with the stdlib and orjson renderers against the raw-bytes relay, per result size
+
+Usage (from backend/):
+    python -m benchmarks.json_path
+    python -m benchmarks.json_path --sizes-kb 10,1000,5000 --seconds 2
+"""
+import argparse
+import json
+import os
+import time
+from unittest.mock import patch
+
+import django
+
+
+def workflow_result(size_kb):
+    """Build an n8n-style JSON body (a list of records) of roughly size_kb kilobytes"""
+    row = {
+        "id": 0,
+        "name": "Quarterly report line",
+        "amount": 1234.56,
+        "tags": ["finance", "q3"],
+        "approved": True,
+        "owner": {"id": 42, "email": "owner@example.com"},
+        "updated_at": "2024-05-01T12:00:00.000Z",
+    }
+    row_size = len(json.dumps(row))
+    rows = [dict(row, id=index) for index in range(max(size_kb * 1024 // row_size, 1))]
+    return json.dumps({"rows": rows}).encode()
+
+
+def upstream_response(body):
+    """Build the requests.Response n8n would return for a body"""
+    import requests
+
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.headers["Content-Type"] = "application/json; charset=utf-8"
+    resp._content = body
+    resp.encoding = "utf-8"
+    return resp
+
+
+def measure(body, relay, renderer, seconds):
+    """
+    Forward one result repeatedly through TriggerWorkflowView and produce the response bytes
+
+    Returns:
+        float: Mean milliseconds per response
+    """
+    from api.views import TriggerWorkflowView
+
+    view = TriggerWorkflowView()
+    resp = upstream_response(body)
+    with patch('api.n8n_client.post', return_value=resp):
+        iterations = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            response = view._forward_to_n8n("http://n8n.invalid/webhook/bench", {}, workflow_slug="bench", relay=relay)
+            content = response.content if relay else renderer.render(response.data, "application/json", {})
+            assert content
+            iterations += 1
+        elapsed = time.perf_counter() - started
+    return elapsed / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-kb', default='1,100,1000', help='Comma-separated result sizes in kilobytes')
+    parser.add_argument('--seconds', type=float, default=1.0, help='Time spent per path and size')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    django.setup()
+
+    from rest_framework.renderers import JSONRenderer
+
+    from api import fast_json
+
+    paths = [
+        ("stdlib", False, JSONRenderer()),
+        ("orjson", False, fast_json.FastJSONRenderer()),
+        ("relay", True, None),
+    ]
+    if fast_json.orjson is None:
+        print("orjson is not installed; the orjson path measures the stdlib fallback")
+
+    print(f"{'size':>8}  " + "  ".join(f"{name:>10}" for name, _, _ in paths) + "  relay speedup")
+    for size_kb in (int(size) for size in args.sizes_kb.split(',')):
+        body = workflow_result(size_kb)
+        timings = [measure(body, relay, renderer, args.seconds) for _, relay, renderer in paths]
+        print(
+            f"{len(body) / 1024:>6.0f}KB  " + "  ".join(f"{ms:>8.3f}ms" for ms in timings)
+            + f"  {timings[0] / timings[-1]:>12.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark of trigger payload validation
+Times parsing a payload, validating it with a precompiled schema, and compiling the schema per request, by payload size
+
+Usage (from backend/):
+    python -m benchmarks.payload_validation
+    python -m benchmarks.payload_validation --sizes-kb 1,64,1024 --seconds 2
+"""
+import argparse
+import json
+import os
+import time
+
+import django
+
+SCHEMA = {
+    "type": "object",
+    "required": ["customer", "lines"],
+    "additionalProperties": False,
+    "properties": {
+        "customer": {"type": "string", "maxLength": 64},
+        "currency": {"enum": ["EUR", "USD", "GBP"]},
+        "lines": {
+            "type": "array",
+            "maxItems": 100_000,
+            "items": {
+                "type": "object",
+                "required": ["sku", "qty", "price"],
+                "properties": {
+                    "sku": {"type": "string", "pattern": "^[A-Z]{3}-[0-9]+$"},
+                    "qty": {"type": "integer", "minimum": 1},
+                    "price": {"type": "number", "minimum": 0},
+                    "note": {"type": ["string", "null"], "maxLength": 200},
+                    "tags": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+        },
+    },
+}
+
+
+def order_payload(size_kb):
+    """Build a payload matching SCHEMA of roughly size_kb kilobytes"""
+    line = {"sku": "ABC-1234", "qty": 3, "price": 19.99, "note": None, "tags": ["gift", "express"]}
+    line_size = len(json.dumps(line))
+    lines = [dict(line, qty=index + 1) for index in range(max(size_kb * 1024 // line_size, 1))]
+    return json.dumps({"customer": "acme", "currency": "EUR", "lines": lines}).encode()
+
+
+def mean_ms(function, seconds):
+    iterations = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        function()
+        iterations += 1
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-kb', default='1,16,256,1024', help='Comma-separated payload sizes in kilobytes')
+    parser.add_argument('--seconds', type=float, default=1.0, help='Time spent per measurement')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    django.setup()
+
+    from api import fast_json, validation
+
+    validate = validation.compile_schema(SCHEMA)
+
+    def check(payload, compiled):
+        errors = []
+        (compiled or validation.compile_schema(SCHEMA))(payload, None, errors)
+        assert not errors, errors
+
+    print(f"{'size':>8}  {'parse':>10}  {'validate':>10}  {'per MB':>10}  {'compiled per request':>20}")
+    for size_kb in (int(size) for size in args.sizes_kb.split(',')):
+        body = order_payload(size_kb)
+        payload = fast_json.loads(body)
+        parse_ms = mean_ms(lambda: fast_json.loads(body), args.seconds)
+        validate_ms = mean_ms(lambda: check(payload, validate), args.seconds)
+        uncached_ms = mean_ms(lambda: check(payload, None), args.seconds)
+        print(
+            f"{len(body) / 1024:>6.0f}KB  {parse_ms:>8.3f}ms  {validate_ms:>8.3f}ms"
+            f"  {validate_ms / (len(body) / 1024 / 1024):>8.1f}ms  {uncached_ms:>18.3f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the trigger rate limiter
+Times api.rate_limit.check() per store and fails when it exceeds the per-request budget
+
+Usage (from backend/):
+    python -m benchmarks.rate_limit
+    python -m benchmarks.rate_limit --iterations 200000 --clients 1000 --budget-us 100
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import django
+
+
+def measure(store, store_options, iterations, clients):
+    """
+    Call rate_limit.check() for a spread of clients under the given store
+
+    Returns:
+        float: Mean microseconds per call
+    """
+    from django.test import override_settings
+
+    from api import rate_limit
+
+    limits = {"USER": {"RATE": 1e9, "BURST": 1e9}, "SLUG": {"RATE": 1e9, "BURST": 1e9}}
+    with override_settings(N8N_RATE_LIMIT=limits, N8N_RATE_LIMIT_STORE=store,
+                           N8N_RATE_LIMIT_STORE_OPTIONS=store_options):
+        rate_limit.reset_store()
+        keys = [f"user:{index}" for index in range(clients)]
+        for key in keys:
+            rate_limit.check("bench", key)
+
+        started = time.perf_counter()
+        for index in range(iterations):
+            rate_limit.check("bench", keys[index % clients])
+        elapsed = time.perf_counter() - started
+        rate_limit.reset_store()
+    return elapsed / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100_000)
+    parser.add_argument('--clients', type=int, default=1000, help='Distinct callers cycled through')
+    parser.add_argument('--budget-us', type=float, default=100, help='Maximum mean cost per request')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    django.setup()
+
+    workdir = tempfile.mkdtemp(prefix='n8n-proxy-ratelimit-')
+    stores = [
+        ("memory", 'api.rate_limit.InMemoryBucketStore', {}, args.iterations),
+        ("sqlite", 'api.rate_limit.SQLiteBucketStore', {"path": os.path.join(workdir, 'ratelimit.sqlite3')},
+         max(args.iterations // 10, 1)),
+    ]
+
+    over_budget = []
+    try:
+        for name, store, options, iterations in stores:
+            cost_us = measure(store, options, iterations, args.clients)
+            print(f"{name:<8} {cost_us:8.2f} us/request ({iterations} requests, {args.clients} clients)")
+            if cost_us > args.budget_us:
+                over_budget.append(name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if over_budget:
+        print(f"Over the {args.budget_us:g} us budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Load test for the API against a local n8n stand-in
+Drives health/, me/ (Basic auth, bearer token and session) and workflows/trigger/ at fixed concurrency levels and compares runs with a baseline
+
+Usage (from backend/):
+    python -m benchmarks.run --concurrency 1,8,32 --duration 10
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from .fake_n8n import FakeN8NServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_USER = ("bench", "bench-password")
+
+SCENARIOS = {
+    "health": {"method": "GET", "path": "/api/health/"},
+    "healthz": {"method": "GET", "path": "/api/healthz/"},
+    "me": {"method": "GET", "path": "/api/me/", "auth": "basic"},
+    "me_token": {"method": "GET", "path": "/api/me/", "auth": "bearer"},
+    "me_session": {"method": "GET", "path": "/api/me/", "auth": "session"},
+    "trigger": {"method": "POST", "path": "/api/workflows/trigger/", "json": {"slug": "bench", "payload": {"n": 1}}},
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * len(sorted_values) + 0.5)) - 1, len(sorted_values) - 1)
+    return sorted_values[max(index, 0)]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _manage(env, *args, capture=False):
+    result = subprocess.run([sys.executable, 'manage.py', *args], cwd=BACKEND_DIR, env=env, check=True,
+                            stdout=subprocess.PIPE if capture else subprocess.DEVNULL, text=True)
+    return result.stdout.strip() if capture else None
+
+
+def create_session(env):
+    """Store a logged-in session for the benchmark user and return its key"""
+    return _manage(env, 'shell', '-c', (
+        "from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY; "
+        "from django.contrib.auth.models import User; "
+        "from django.conf import settings; "
+        "from django.contrib.sessions.backends.db import SessionStore; "
+        f"user = User.objects.get(username={BENCH_USER[0]!r}); "
+        "session = SessionStore(); "
+        "session[SESSION_KEY] = str(user.pk); "
+        "session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]; "
+        "session[HASH_SESSION_KEY] = user.get_session_auth_hash(); "
+        "session.create(); "
+        "print(session.session_key)"
+    ), capture=True)
+
+
+def start_server(args, env):
+    """
+    Start the API in a subprocess and wait until it answers
+
+    Returns:
+        tuple: (subprocess.Popen, base URL)
+    """
+    port = _free_port()
+    if args.server == 'gunicorn' and shutil.which('gunicorn'):
+        command = [
+            'gunicorn', 'core.wsgi:application', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning',
+        ]
+    elif args.server == 'uvicorn' and shutil.which('uvicorn'):
+        command = ['uvicorn', 'core.asgi:application', '--port', str(port), '--workers', str(args.workers),
+                   '--log-level', 'warning']
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + '/api/health/', timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server did not start: {' '.join(command)}")
+
+
+def server_rss_bytes(process):
+    """Resident memory of the server process and its workers, read from /proc (Linux only)"""
+    pids = [process.pid]
+    children_path = f'/proc/{process.pid}/task/{process.pid}/children'
+    if os.path.exists(children_path):
+        with open(children_path) as children:
+            pids += [int(pid) for pid in children.read().split()]
+
+    per_process = []
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status_file:
+                for line in status_file:
+                    if line.startswith('VmRSS:'):
+                        per_process.append(int(line.split()[1]) * 1024)
+        except OSError:
+            continue
+    return per_process
+
+
+def login(base_url):
+    """Exchange the benchmark user's password for a bearer token"""
+    resp = requests.post(base_url + '/api/auth/login/', json={"username": BENCH_USER[0], "password": BENCH_USER[1]},
+                         timeout=10)
+    resp.raise_for_status()
+    return resp.json()["token"]
+
+
+def run_scenario(base_url, scenario, concurrency, duration, warmup, token=None, session_key=None):
+    """
+    Hammer one endpoint with `concurrency` keep-alive clients
+
+    Returns:
+        dict: Request count, errors, requests/second and latency percentiles in ms
+    """
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop_at = [0.0]
+    measure_from = [0.0]
+    start = threading.Barrier(concurrency + 1)
+
+    def client(index):
+        session = requests.Session()
+        if scenario.get("auth") == "basic":
+            session.auth = BENCH_USER
+        elif scenario.get("auth") == "bearer":
+            session.headers["Authorization"] = f"Bearer {token}"
+        elif scenario.get("auth") == "session":
+            session.cookies.set("sessionid", session_key)
+        url = base_url + scenario["path"]
+        start.wait()
+        while True:
+            began = time.perf_counter()
+            if began >= stop_at[0]:
+                break
+            try:
+                resp = session.request(scenario["method"], url, json=scenario.get("json"), timeout=30)
+                failed = resp.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - began
+            if began >= measure_from[0]:
+                latencies[index].append(elapsed)
+                errors[index] += failed
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    now = time.perf_counter()
+    measure_from[0] = now + warmup
+    stop_at[0] = now + warmup + duration
+    start.wait()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(latency for per_client in latencies for latency in per_client)
+    return {
+        "requests": len(samples),
+        "errors": sum(errors),
+        "rps": round(len(samples) / duration, 1),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print deltas against a baseline run
+
+    Returns:
+        list: Descriptions of metrics that regressed by more than `tolerance`
+    """
+    regressions = []
+    print(f"\nComparison with baseline (tolerance {tolerance:.0%}):")
+    for key, current in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous:
+            print(f"  {key}: no baseline")
+            continue
+        rps_change = (current["rps"] - previous["rps"]) / previous["rps"] if previous["rps"] else 0.0
+        p95_change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0.0
+        print(f"  {key}: rps {rps_change:+.1%}, p95 {p95_change:+.1%}")
+        if rps_change < -tolerance:
+            regressions.append(f"{key} rps {rps_change:+.1%}")
+        if p95_change > tolerance:
+            regressions.append(f"{key} p95 {p95_change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenarios to run')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=10, help='Measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=1, help='Unmeasured seconds before each run')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn', 'runserver'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--database-url', help='Benchmark against this database instead of a throwaway SQLite file')
+    parser.add_argument('--conn-max-age', type=int, default=60,
+                        help='Seconds to keep database connections open (0 reconnects on every request)')
+    parser.add_argument('--n8n-latency', type=float, default=0.05, help='Fake n8n mean latency in seconds')
+    parser.add_argument('--n8n-jitter', type=float, default=0.0)
+    parser.add_argument('--n8n-error-rate', type=float, default=0.0)
+    parser.add_argument('--n8n-payload-size', type=int, default=256)
+    parser.add_argument('--n8n-instances', type=int, default=1,
+                        help='Fake n8n instances the bench slug is balanced over')
+    parser.add_argument('--n8n-slow-latency', type=float,
+                        help='Mean latency of the first fake n8n instance, to compare balancing strategies')
+    parser.add_argument('--balancing', choices=['round_robin', 'least_in_flight', 'ewma'], default='round_robin',
+                        help='Load balancing strategy across --n8n-instances')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--save-baseline', help='Write results as the new baseline to this file')
+    parser.add_argument('--compare', help='Baseline file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    fake_n8ns = [
+        FakeN8NServer(
+            latency=args.n8n_slow_latency if index == 0 and args.n8n_slow_latency is not None else args.n8n_latency,
+            latency_jitter=args.n8n_jitter, error_rate=args.n8n_error_rate, payload_size=args.n8n_payload_size,
+        ).start()
+        for index in range(args.n8n_instances)
+    ]
+
+    workdir = tempfile.mkdtemp(prefix='n8n-proxy-bench-')
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='benchmarks.settings',
+        BENCH_DB_PATH=os.path.join(workdir, 'db.sqlite3'),
+        BENCH_N8N_URL=','.join(fake_n8n.url for fake_n8n in fake_n8ns),
+        N8N_LOAD_BALANCING_STRATEGY=args.balancing,
+        DB_CONN_MAX_AGE=str(args.conn_max_age),
+        PYTHONPATH=BACKEND_DIR,
+    )
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    _manage(env, 'migrate', '--noinput')
+    # A shared database may already hold the user from an earlier run
+    _manage(env, 'shell', '-c',
+            "from django.contrib.auth.models import User; "
+            f"User.objects.filter(username={BENCH_USER[0]!r}).exists() or "
+            f"User.objects.create_user({BENCH_USER[0]!r}, password={BENCH_USER[1]!r})")
+    session_key = create_session(env)
+
+    process, base_url = start_server(args, env)
+    results = {}
+    memory = {}
+    try:
+        token = login(base_url)
+        for name in args.scenarios.split(','):
+            for concurrency in [int(level) for level in args.concurrency.split(',')]:
+                key = f"{name}@{concurrency}"
+                results[key] = run_scenario(
+                    base_url, SCENARIOS[name], concurrency, args.duration, args.warmup,
+                    token=token, session_key=session_key,
+                )
+                stats = results[key]
+                print(f"{key:<16} {stats['rps']:>9} req/s  p50 {stats['p50_ms']:>8} ms  "
+                      f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+            memory[name] = server_rss_bytes(process)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        for fake_n8n in fake_n8ns:
+            fake_n8n.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, per_process in memory.items():
+        print(f"RSS after {name}: " + ", ".join(f"{rss / 2 ** 20:.1f} MiB" for rss in per_process))
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "server": args.server,
+            "workers": args.workers,
+            "threads": args.threads,
+            "database": args.database_url.split('://')[0] if args.database_url else "sqlite",
+            "conn_max_age": args.conn_max_age,
+            "n8n_instances": args.n8n_instances,
+            "balancing": args.balancing,
+            "n8n_latency": args.n8n_latency,
+            "n8n_error_rate": args.n8n_error_rate,
+            "n8n_payload_size": args.n8n_payload_size,
+            "duration": args.duration,
+        },
+        "results": results,
+        "memory_rss_bytes": memory,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as output:
+            json.dump(report, output, indent=2)
+            output.write('\n')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
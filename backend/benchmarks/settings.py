@@ -0,0 +1,35 @@
+"""
+Settings for benchmark runs
+Uses a throwaway SQLite database (unless DATABASE_URL is set) and points the benchmark slug at the fake n8n server
+"""
+import os
+
+from core.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+if not DATABASE_URL:  # noqa: F405
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('BENCH_DB_PATH', '/tmp/n8n-proxy-bench.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,  # noqa: F405
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,  # noqa: F405
+        }
+    }
+
+# Comma-separated when the bench slug is balanced over several fake n8n instances
+_BENCH_N8N_URLS = os.environ.get('BENCH_N8N_URL', 'http://127.0.0.1:5679/webhook/bench').split(',')
+N8N_WEBHOOKS = {
+    "bench": _BENCH_N8N_URLS if len(_BENCH_N8N_URLS) > 1 else _BENCH_N8N_URLS[0],
+}
+
+# Measure the proxy itself: nothing served from cache or shared between requests
+N8N_WORKFLOW_CACHE = {}
+N8N_CIRCUIT_BREAKERS = {"bench": None}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {'level': 'WARNING'},
+}
@@ -0,0 +1,111 @@
+"""
+Cold-start report for the serverless entry point
+Times `import index` in fresh interpreters per settings profile and breaks import cost down per module
+
+Usage (from backend/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --profiles core.settings_api --top 30
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_TIMED_IMPORT = (
+    "import time; started = time.perf_counter(); import index; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def _run(profile, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _TIMED_IMPORT]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+    return subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds) per imported module
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def profile_report(profile, runs, top):
+    """
+    Measure one settings profile
+
+    Returns:
+        dict: Wall time statistics in ms, import count, and the costliest modules and packages
+    """
+    wall_ms = [float(_run(profile).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    modules = parse_importtime(_run(profile, importtime=True).stderr)
+
+    packages = {}
+    for name, self_us, _ in modules:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    return {
+        "wall_ms": {
+            "median": round(statistics.median(wall_ms), 1),
+            "min": round(min(wall_ms), 1),
+            "max": round(max(wall_ms), 1),
+        },
+        "modules_imported": len(modules),
+        "top_modules": [
+            {"module": name, "self_ms": round(self_us / 1000, 2), "cumulative_ms": round(cumulative_us / 1000, 2)}
+            for name, self_us, cumulative_us in sorted(modules, key=lambda module: -module[2])[:top]
+        ],
+        "top_packages": [
+            {"package": package, "self_ms": round(self_us / 1000, 2)}
+            for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', default='core.settings,core.settings_api',
+                        help='Comma-separated DJANGO_SETTINGS_MODULE values to compare')
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts timed per profile')
+    parser.add_argument('--top', type=int, default=15, help='Modules and packages listed per profile')
+    parser.add_argument('--output', help='Write the report as JSON to this file')
+    args = parser.parse_args()
+
+    report = {}
+    for profile in args.profiles.split(','):
+        report[profile] = result = profile_report(profile, args.runs, args.top)
+        wall = result["wall_ms"]
+        print(f"\n{profile}: import index median {wall['median']} ms "
+              f"(min {wall['min']}, max {wall['max']}), {result['modules_imported']} modules")
+        print("  cumulative ms  self ms  module")
+        for entry in result["top_modules"]:
+            print(f"  {entry['cumulative_ms']:>13}  {entry['self_ms']:>7}  {entry['module']}")
+        print("  self ms by top-level package: " + ", ".join(
+            f"{entry['package']} {entry['self_ms']}" for entry in result["top_packages"]
+        ))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+            output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+# Serve with an ASGI server, e.g. `uvicorn core.asgi:application`, so that
+# /api/workflows/trigger-async/ can await n8n without holding a thread
+application = get_asgi_application()
@@ -0,0 +1,55 @@
+"""
+Database router for read replicas
+Sends reads to settings.DATABASE_REPLICAS and keeps a request on the primary once it has written
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_started
+
+PRIMARY = "default"
+
+_wrote = ContextVar("wrote_to_primary", default=False)
+
+
+class ReplicaRouter:
+    """
+    Routes reads to a random read replica and writes to the primary
+
+    Once a request has written, its reads go to the primary too, so it sees
+    its own changes despite replication lag. Models listed in
+    settings.DATABASE_PRIMARY_MODELS ("app_label.model") always read from the
+    primary. Without replicas every query goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas or _wrote.get():
+            return None
+        if model._meta.label_lower in getattr(settings, 'DATABASE_PRIMARY_MODELS', ()):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {PRIMARY, *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, 'DATABASE_REPLICAS', ()):
+            return False
+        return None
+
+
+def _request_started(**kwargs):
+    _wrote.set(False)
+
+
+request_started.connect(_request_started)
@@ -0,0 +1,35 @@
+"""
+Lean API-only settings profile, used by the Vercel entry point (index.py)
+
+Loads only what api.urls needs: no admin, messages, staticfiles or template
+engine, and JSON-only DRF rendering. Run migrations and the admin with
+core.settings.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'rest_framework',
+    'corsheaders',
+    'api',
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware != 'django.contrib.messages.middleware.MessageMiddleware'
+]
+
+ROOT_URLCONF = 'core.urls_api'
+
+TEMPLATES = []
+
+USE_I18N = False
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # The browsable API needs templates and staticfiles
+    'DEFAULT_RENDERER_CLASSES': ['api.fast_json.FastJSONRenderer'],
+}
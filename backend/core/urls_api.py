@@ -0,0 +1,6 @@
+from django.urls import path, include
+
+# URLconf of the API-only settings profile (core.settings_api): no admin
+urlpatterns = [
+    path('api/', include('api.urls')),
+]
@@ -4,8 +4,8 @@ import os
 # Add the backend directory to the path
 sys.path.insert(0, os.path.dirname(__file__))
 
-# Set Django settings module
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Use the lean API-only profile unless told otherwise (see core/settings_api.py)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings_api')
 
 # Import Django and set it up
 import django
@@ -14,5 +14,16 @@ django.setup()
 # Import the WSGI application
 from core.wsgi import application
 
+# Vercel reuses this module across invocations of a warm instance, so load the
+# URLconf (api.views and DRF) and DRF's configured classes now rather than
+# inside the first request
+from django.urls import get_resolver
+from rest_framework.settings import api_settings
+
+get_resolver().url_patterns
+for setting in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES',
+                'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES'):
+    getattr(api_settings, setting)
+
 # Export for Vercel
-app = application
\ No newline at end of file
+app = application